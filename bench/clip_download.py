@@ -0,0 +1,107 @@
+"""
+Compare le téléchargement des clips : moteur en processus (DownloadEngine) contre un processus yt-dlp par clip.
+
+Les clips sont générés avec ffmpeg et servis par un serveur HTTP local.
+Lancer depuis la racine du dépôt (yt-dlp installé en module et en ligne de commande) :
+    python -m bench.clip_download [--clips 20] [--seconds 10] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import functools
+import http.server
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from moviepy.config import FFMPEG_BINARY
+from src.clip_downloader import DownloadEngine, download_clips
+
+
+class SubprocessEngine(DownloadEngine):
+    """Moteur désactivé : download_clips retombe sur un processus yt-dlp par clip."""
+
+    @property
+    def available(self) -> bool:
+        return False
+
+
+def generate_clips(directory: str, count: int, seconds: int) -> list[str]:
+    """Encode un clip de test 720p30 et le copie `count` fois."""
+    source = os.path.join(directory, "clip_0.mp4")
+    subprocess.run(
+        [
+            FFMPEG_BINARY, "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=s=1280x720:r=30:d={seconds}",
+            "-f", "lavfi", "-i", f"sine=r=48000:d={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", source,
+        ],
+        check=True,
+    )
+    names = ["clip_0.mp4"]
+    for i in range(1, count):
+        names.append(f"clip_{i}.mp4")
+        shutil.copy(source, os.path.join(directory, names[-1]))
+    return names
+
+
+def serve(directory: str) -> http.server.ThreadingHTTPServer:
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+async def run(name: str, engine: DownloadEngine, urls: list[str], concurrency: int):
+    output_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        jobs = [(url, os.path.join(output_dir, f"{i}.mp4")) for i, url in enumerate(urls)]
+        started = time.perf_counter()
+        results = await download_clips(jobs, concurrency=concurrency, engine=engine)
+        elapsed = time.perf_counter() - started
+        total = sum(result.bytes for result in results if result.success)
+        succeeded = sum(result.success for result in results)
+        return name, elapsed, total, succeeded
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clips", type=int, default=20)
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    source_dir = tempfile.mkdtemp(prefix="bench_clips_")
+    server = serve(source_dir)
+    try:
+        names = generate_clips(source_dir, args.clips, args.seconds)
+        host, port = server.server_address
+        urls = [f"http://{host}:{port}/{name}" for name in names]
+
+        measures = [
+            asyncio.run(run("moteur", DownloadEngine(args.concurrency), urls, args.concurrency)),
+            asyncio.run(run("sous-processus", SubprocessEngine(), urls, args.concurrency)),
+        ]
+        print(f"\n{args.clips} clips de {args.seconds}s, {args.concurrency} téléchargements simultanés")
+        for name, elapsed, total, succeeded in measures:
+            print(
+                f"{name:<15} {elapsed:7.2f}s  {args.clips / elapsed:6.2f} clips/s  "
+                f"{total / (1024 * 1024):7.1f} Mo  {succeeded}/{args.clips} réussis"
+            )
+    finally:
+        server.shutdown()
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
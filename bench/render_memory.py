@@ -0,0 +1,149 @@
+"""
+Vérifie que la mémoire et le nombre de processus du rendu ne croissent pas avec le nombre de clips.
+
+concatClips est lancé sur N clips lavfi puis sur davantage de clips, chaque fois dans un
+interpréteur neuf avec RENDER_WORKERS fixé (le nombre de processus ne dépend pas de la machine)
+et un dossier de travail temporaire (les caches data/ ne sont pas écrits dans le dépôt).
+Le pic de processus descendants et le pic de RSS (processus et descendants) sont relevés
+via /proc (Linux) et doivent rester du même ordre.
+Lancer depuis la racine du dépôt :
+    python -m bench.render_memory [--small 4] [--large 12] [--workers 2] [--seconds 2] [--tolerance 1.25]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from moviepy.config import FFMPEG_BINARY
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def generate_clips(directory: str, count: int, seconds: int) -> list[str]:
+    """Encode `count` clips de test 720p30 différents."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"clip_{i}.mp4")
+        subprocess.run(
+            [
+                FFMPEG_BINARY, "-v", "error", "-y",
+                "-f", "lavfi", "-i", f"testsrc2=s=1280x720:r=30:d={seconds}",
+                "-f", "lavfi", "-i", f"sine=f={220 + 20 * i}:r=48000:d={seconds}",
+                "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", path,
+            ],
+            check=True,
+        )
+        paths.append(path)
+    return paths
+
+
+def process_tree(root: int) -> tuple[int, int]:
+    """Nombre de descendants de `root` et RSS cumulé (octets) de `root` et de ses descendants."""
+    parents = {}
+    rss = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat") as f:
+                # Le nom du processus (2e champ) peut contenir des espaces
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        parents[int(name)] = int(fields[1])
+        rss[int(name)] = int(fields[21]) * PAGE_SIZE
+    tree = {root}
+    added = True
+    while added:
+        children = {pid for pid, ppid in parents.items() if ppid in tree} - tree
+        tree |= children
+        added = bool(children)
+    return len(tree) - 1, sum(rss.get(pid, 0) for pid in tree)
+
+
+def measure_concat(clips: list[str], output_path: str, work_dir: str, workers: int, results):
+    """Exécuté dans un interpréteur neuf : rend le best-of et renvoie les pics relevés."""
+    # Avant l'import : RENDER_WORKERS est lu au chargement du module
+    os.environ["RENDER_WORKERS"] = str(workers)
+    assets_path = os.path.abspath("assets")
+    os.chdir(work_dir)
+    if not os.path.exists("assets"):
+        os.symlink(assets_path, "assets")
+    from src.videoAssembler import concatClips
+
+    stop = threading.Event()
+    peak = [0, 0]
+
+    def sample():
+        while not stop.is_set():
+            processes, rss = process_tree(os.getpid())
+            peak[0] = max(peak[0], processes)
+            peak[1] = max(peak[1], rss)
+            time.sleep(0.05)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        output = concatClips([(clip, f"streamer{i}") for i, clip in enumerate(clips)], output_path)
+    finally:
+        stop.set()
+        sampler.join()
+    results.put((bool(output), time.perf_counter() - started, peak[0], peak[1]))
+
+
+def run(clips: list[str], work_dir: str, workers: int) -> tuple[bool, float, int, int]:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=measure_concat,
+        args=(clips, os.path.join(work_dir, f"bestof_{len(clips)}.mp4"), work_dir, workers, results),
+    )
+    process.start()
+    measure = results.get()
+    process.join()
+    return measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--small", type=int, default=4)
+    parser.add_argument("--large", type=int, default=12)
+    # Fixé pour les deux rendus : au plus le nombre de segments distincts du petit rendu
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seconds", type=int, default=2)
+    # Marge tolérée sur le RSS du grand rendu par rapport au petit
+    parser.add_argument("--tolerance", type=float, default=1.25)
+    args = parser.parse_args()
+    # Petit rendu : intro, transition, outro et `small` clips
+    assert 1 <= args.workers <= args.small + 3, "--workers doit rester sous le nombre de segments"
+
+    work_dir = tempfile.mkdtemp(prefix="bench_memory_")
+    try:
+        clips = generate_clips(work_dir, args.large, args.seconds)
+        measures = {}
+        for count in (args.small, args.large):
+            success, elapsed, processes, rss = run(clips[:count], work_dir, args.workers)
+            measures[count] = (processes, rss)
+            print(
+                f"{count:>3} clips  {elapsed:7.2f}s  pic {processes} processus  "
+                f"pic RSS {rss / (1024 * 1024):7.1f} Mo  {'réussi' if success else 'échec'}"
+            )
+            assert success, f"rendu de {count} clips en échec"
+        small, large = measures[args.small], measures[args.large]
+        assert large[0] <= small[0], f"processus: {large[0]} pour {args.large} clips contre {small[0]}"
+        assert large[1] <= small[1] * args.tolerance, (
+            f"RSS: {large[1] // 2**20} Mo pour {args.large} clips contre {small[1] // 2**20} Mo"
+        )
+        print("Mémoire et processus bornés : OK")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
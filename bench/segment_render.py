@@ -0,0 +1,115 @@
+"""
+Compare le rendu des segments : un par un dans le processus contre en parallèle (ProcessPoolExecutor).
+
+Les clips sont générés avec ffmpeg (lavfi) puis normalisés avec leur tag, comme dans concatClips.
+Lancer depuis la racine du dépôt :
+    python -m bench.segment_render [--clips 6] [--seconds 5] [--workers RENDER_WORKERS] [--height 720]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from moviepy.config import FFMPEG_BINARY
+from src.videoAssembler import (
+    DEFAULT_PROFILE,
+    RENDER_WORKERS,
+    render_segment_targets,
+    render_tag_image,
+    worker_profile,
+)
+
+
+def generate_clips(directory: str, count: int, seconds: int) -> list[str]:
+    """Encode `count` clips de test 1080p60 différents (le rendu ne doit rien pouvoir copier)."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"clip_{i}.mp4")
+        subprocess.run(
+            [
+                FFMPEG_BINARY, "-v", "error", "-y",
+                "-f", "lavfi", "-i", f"testsrc2=s=1920x1080:r=60:d={seconds}",
+                "-f", "lavfi", "-i", f"sine=f={220 + 40 * i}:r=48000:d={seconds}",
+                "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", path,
+            ],
+            check=True,
+        )
+        paths.append(path)
+    return paths
+
+
+def render_serial(clips: list[str], output_dir: str, profile) -> list[str]:
+    return [
+        render_segment_targets(
+            clip, [os.path.join(output_dir, f"{i:03d}.mp4")], f"@streamer{i}", [profile]
+        )[0]
+        for i, clip in enumerate(clips)
+    ]
+
+
+def render_parallel(clips: list[str], output_dir: str, profile, workers: int) -> list[str]:
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                render_segment_targets,
+                clip,
+                [os.path.join(output_dir, f"{i:03d}.mp4")],
+                f"@streamer{i}",
+                [profile],
+            )
+            for i, clip in enumerate(clips)
+        ]
+        return [future.result()[0] for future in futures]
+
+
+def measure(name: str, render, clips: list[str], *args) -> float:
+    output_dir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        started = time.perf_counter()
+        outputs = render(clips, output_dir, *args)
+        elapsed = time.perf_counter() - started
+        succeeded = sum(1 for output in outputs if output)
+        print(
+            f"{name:<10} {elapsed:7.2f}s  {len(clips) / elapsed:6.2f} segments/s  "
+            f"{succeeded}/{len(clips)} réussis"
+        )
+        return elapsed
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clips", type=int, default=6)
+    parser.add_argument("--seconds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS)
+    parser.add_argument("--height", type=int, default=720, choices=(720, 1080))
+    args = parser.parse_args()
+
+    base = replace(DEFAULT_PROFILE, width=args.height * 16 // 9, height=args.height)
+    source_dir = tempfile.mkdtemp(prefix="bench_sources_")
+    try:
+        clips = generate_clips(source_dir, args.clips, args.seconds)
+        print(
+            f"{args.clips} segments de {args.seconds}s rendus en {base.width}x{base.height}, "
+            f"{os.cpu_count()} cœurs, {args.workers} processus"
+        )
+        # Tags déjà en cache pour les deux mesures : seul le rendu des segments est comparé
+        for i in range(args.clips):
+            render_tag_image(f"@streamer{i}", base)
+        serial = measure("série", render_serial, clips, worker_profile(base, 1))
+        parallel = measure(
+            "parallèle", render_parallel, clips, worker_profile(base, args.workers), args.workers
+        )
+        print(f"Accélération: x{serial / parallel:.2f}")
+    finally:
+        shutil.rmtree(source_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compare l'incrustation du tag : composition MoviePy (CompositeVideoClip) contre filtre overlay de ffmpeg.
+
+Le même clip lavfi est rendu avec le même tag et le même profil par les deux chemins de videoAssembler.
+Lancer depuis la racine du dépôt :
+    python -m bench.tag_overlay [--seconds 10] [--height 1080]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import replace
+from moviepy.config import FFMPEG_BINARY
+from src.videoAssembler import (
+    DEFAULT_PROFILE,
+    _render_segment_ffmpeg,
+    _render_segment_moviepy,
+    render_tag_image,
+    worker_profile,
+)
+
+TAG = "@streamer"
+
+
+def generate_clip(path: str, seconds: int):
+    """Encode un clip de test 1080p60 avec du son."""
+    subprocess.run(
+        [
+            FFMPEG_BINARY, "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=s=1920x1080:r=60:d={seconds}",
+            "-f", "lavfi", "-i", f"sine=r=48000:d={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", path,
+        ],
+        check=True,
+    )
+
+
+def render_composite(source: str, output: str, tag_image: str, profile) -> bool:
+    return bool(_render_segment_moviepy(source, output, tag_image, profile))
+
+
+def render_overlay(source: str, output: str, tag_image: str, profile) -> bool:
+    return _render_segment_ffmpeg(source, [output], [tag_image], [profile], None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=10)
+    parser.add_argument("--height", type=int, default=1080, choices=(720, 1080))
+    args = parser.parse_args()
+
+    profile = worker_profile(
+        replace(DEFAULT_PROFILE, width=args.height * 16 // 9, height=args.height), 1
+    )
+    frames = args.seconds * profile.fps
+    work_dir = tempfile.mkdtemp(prefix="bench_tag_")
+    try:
+        source = os.path.join(work_dir, "source.mp4")
+        generate_clip(source, args.seconds)
+        tag_image = render_tag_image(TAG, profile)
+        print(f"Clip de {args.seconds}s rendu en {profile.width}x{profile.height} à {profile.fps} images/s")
+        for name, render in (
+            ("CompositeVideoClip", render_composite),
+            ("overlay ffmpeg", render_overlay),
+        ):
+            output = os.path.join(work_dir, f"{name.split()[0]}.mp4")
+            started = time.perf_counter()
+            success = render(source, output, tag_image, profile)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{name:<19} {elapsed:7.2f}s  {frames / elapsed:7.1f} images/s  "
+                f"{'réussi' if success else 'échec'}"
+            )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
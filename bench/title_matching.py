@@ -0,0 +1,68 @@
+"""
+Compare la recherche de termes dans les titres : boucle `term in title.lower()` contre TitleMatcher.
+
+Lancer depuis la racine du dépôt :
+    python -m bench.title_matching [--titles 100000]
+"""
+
+import argparse
+import random
+import time
+from src.title_matcher import TitleMatcher
+
+# Termes de l'ancienne configuration : les variantes étaient listées à la main
+LEGACY_TERMS = ["[MindCityRP]", "[MindCity]", "[MindCity RP]", "[MindCity-RP]"]
+# Termes actuels : le TitleMatcher reconnaît seul les variantes
+MATCHER_TERMS = ["[MindCityRP]", "[MindCity]"]
+
+_WORDS = ["gta", "rp", "course", "poursuite", "lspd", "braquage", "fou rire", "ems", "mairie"]
+_TAGS = ["[MindCityRP]", "[MindCity RP]", "[mindcity-rp]", "(MindCity)", "[Reroll]", "", ""]
+
+
+def synthetic_titles(count: int, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    titles = []
+    for _ in range(count):
+        words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 10)))
+        tag = rng.choice(_TAGS)
+        titles.append(f"{tag} {words}" if rng.random() < 0.5 else f"{words} {tag}")
+    return titles
+
+
+def legacy_matches(titles: list[str], terms: list[str]) -> int:
+    """Ancienne recherche : minuscules, puis un `in` par terme."""
+    terms_lower = [term.lower() for term in terms]
+    count = 0
+    for title in titles:
+        title_lower = title.lower()
+        if any(term in title_lower for term in terms_lower):
+            count += 1
+    return count
+
+
+def matcher_matches(titles: list[str], terms: list[str]) -> int:
+    matcher = TitleMatcher(terms)
+    return sum(1 for title in titles if matcher.matches(title))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--titles", type=int, default=100000)
+    args = parser.parse_args()
+
+    titles = synthetic_titles(args.titles)
+    print(f"Recherche dans {len(titles)} titres synthétiques")
+    for name, match, terms in (
+        ("boucle in", legacy_matches, LEGACY_TERMS),
+        ("TitleMatcher", matcher_matches, MATCHER_TERMS),
+    ):
+        started = time.perf_counter()
+        count = match(titles, terms)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{name:<13} {elapsed:7.3f}s  {len(titles) / elapsed:12.0f} titres/s  {count} titres reconnus"
+        )
+
+
+if __name__ == "__main__":
+    main()
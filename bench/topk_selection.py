@@ -0,0 +1,67 @@
+"""
+Compare la sélection des K clips les plus vus : liste complète triée contre tas-min (TopKClips).
+
+Lancer depuis la racine du dépôt :
+    python -m bench.topk_selection [--clips 100000] [--k 20]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from src.clip_selection import TopKClips
+from src.twitchClips import Clip
+
+
+def synthetic_clips(count: int, seed: int = 42):
+    """Flux de clips synthétiques, aux vues réparties comme sur Twitch (beaucoup de petits clips)."""
+    rng = random.Random(seed)
+    for i in range(count):
+        yield Clip(
+            id=f"clip{i}",
+            url=f"https://clips.twitch.tv/clip{i}",
+            title=f"Clip {i}",
+            broadcaster_name=f"streamer{i % 500}",
+            view_count=int(rng.paretovariate(1.2) * 10),
+        )
+
+
+def list_and_sort(clips, k: int) -> list[Clip]:
+    """Ancienne sélection : tous les clips en mémoire, puis tri complet."""
+    all_clips = list(clips)
+    all_clips.sort(key=lambda clip: clip.view_count, reverse=True)
+    return all_clips[:k]
+
+
+def heap_top_k(clips, k: int) -> list[Clip]:
+    top_k = TopKClips(k)
+    top_k.extend(clips)
+    return top_k.results()
+
+
+def measure(name: str, select, count: int, k: int) -> list[Clip]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    selected = select(synthetic_clips(count), k)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<14} {elapsed:7.3f}s  pic mémoire {peak / (1024 * 1024):8.2f} Mo")
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clips", type=int, default=100000)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"Sélection des {args.k} meilleurs clips parmi {args.clips} clips synthétiques")
+    sorted_clips = measure("liste + tri", list_and_sort, args.clips, args.k)
+    heap_clips = measure("tas-min", heap_top_k, args.clips, args.k)
+    # Même sélection, dans le même ordre (à vues égales, le premier clip reçu est gardé)
+    assert [clip.id for clip in sorted_clips] == [clip.id for clip in heap_clips]
+
+
+if __name__ == "__main__":
+    main()
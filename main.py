@@ -1,19 +1,21 @@
-import os
 import asyncio
 import signal
-import sys
-import schedule
-import time
-import threading
 import argparse
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from twitchAPI.twitch import Twitch
+from src.twitchClips import login
+from src.rate_limiter import TokenBucket, create_helix_rate_limiter
 from src.streamer_watcher import monitor_streamers
-from src.bestof_generator import generate_weekly_bestof
+from src.bestof_generator import generate_weekly_bestof, update_clip_catalog
+from src.clip_prefetcher import prefetch_bestof_clips
 
 
 # Configuration
 GAME_ID = "32982"  # ID de GTA V
-SEARCH_TERMS = ["[MindCityRP]", "[MindCity]", "[MindCity RP]", "[MindCity-RP]"]
+# Les variantes d'espacement, de tirets et de crochets ("[MindCity RP]", "[MindCity-RP]", ...)
+# sont reconnues automatiquement par le TitleMatcher
+SEARCH_TERMS = ["[MindCityRP]", "[MindCity]"]
 # SEARCH_TERMS = [
 #     "[RerollRP]",
 #     "[Reroll]",
@@ -27,41 +29,93 @@ SEARCH_TERMS = ["[MindCityRP]", "[MindCity]", "[MindCity RP]", "[MindCity-RP]"]
 #     "RerollRP",
 # ]
 CHECK_INTERVAL_MINUTES = 15
+MIN_VIEWERS = 0  # Arrête le parcours des streams sous ce nombre de spectateurs (0: tous)
 BESTOF_DAY = "sunday"  # Jour de génération du best-of
+HARVEST_INTERVAL_HOURS = 6  # Intervalle entre deux récoltes incrémentales de clips
 
-# Variable pour contrôler l'arrêt du programme
-running = True
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+BESTOF_TIME = "00:00"  # Heure de génération du best-of
 
 
-# Fonction pour exécuter le générateur de best-of
-def run_bestof_generator():
-    print(
-        f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Démarrage de la génération du best-of hebdomadaire..."
+def seconds_until_next_bestof(now: Optional[datetime] = None) -> float:
+    """Retourne le nombre de secondes avant le prochain créneau BESTOF_DAY à BESTOF_TIME."""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in BESTOF_TIME.split(":"))
+    days_ahead = (WEEKDAYS.index(BESTOF_DAY) - now.weekday()) % 7
+    target = (now + timedelta(days=days_ahead)).replace(
+        hour=hour, minute=minute, second=0, microsecond=0
     )
-    asyncio.run(generate_weekly_bestof()) # type: ignore
-    print(
-        f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Génération du best-of terminée."
-    )
-
-
-# Fonction pour exécuter le planificateur dans un thread séparé
-def run_scheduler():
-    while running:
-        schedule.run_pending()
-        time.sleep(60)  # Vérifier toutes les minutes
+    if target <= now:
+        target += timedelta(days=7)
+    return (target - now).total_seconds()
+
+
+def next_bestof_window_start() -> datetime:
+    """Retourne le début de la fenêtre de 7 jours couverte par le prochain best-of."""
+    next_bestof = datetime.now(timezone.utc) + timedelta(seconds=seconds_until_next_bestof())
+    return next_bestof - timedelta(days=7)
+
+
+# Tâche qui génère le best-of chaque semaine, sur la boucle asyncio principale
+async def bestof_scheduler(
+    twitch: Twitch, rate_limiter: TokenBucket, catalog_lock: asyncio.Lock
+):
+    while True:
+        delay = seconds_until_next_bestof()
+        print(f"Prochaine génération du best-of dans {delay / 3600:.1f} heures")
+        await asyncio.sleep(delay)
+        print(
+            f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Démarrage de la génération du best-of hebdomadaire..."
+        )
+        try:
+            # Le verrou n'est pris que pendant la récolte et la sélection des clips,
+            # pas pendant les téléchargements, le rendu et la publication
+            await generate_weekly_bestof(
+                game_id=GAME_ID,
+                search_terms=SEARCH_TERMS,
+                twitch=twitch,
+                rate_limiter=rate_limiter,
+                catalog_lock=catalog_lock,
+            )
+        except Exception as e:
+            print(f"Erreur lors de la génération du best-of: {e}")
+        print(
+            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Génération du best-of terminée."
+        )
 
 
-# Gestionnaire de signal pour arrêter proprement le programme
-def signal_handler(sig, frame):
-    global running
-    print("\nArrêt du programme en cours...")
-    running = False
-    sys.exit(0)
+# Tâche qui récolte les clips au fil de la semaine et précharge les meilleurs candidats,
+# pour alléger la génération du dimanche
+async def harvest_scheduler(
+    twitch: Twitch, rate_limiter: TokenBucket, catalog_lock: asyncio.Lock
+):
+    while True:
+        await asyncio.sleep(HARVEST_INTERVAL_HOURS * 3600)
+        print(
+            f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Récolte incrémentale des clips..."
+        )
+        try:
+            async with catalog_lock:
+                await update_clip_catalog(
+                    game_id=GAME_ID,
+                    search_terms=SEARCH_TERMS,
+                    twitch=twitch,
+                    rate_limiter=rate_limiter,
+                )
+        except Exception as e:
+            print(f"Erreur lors de la récolte des clips: {e}")
+            continue
+
+        # Télécharger dès maintenant les clips en tête du catalogue fraîchement mis à jour
+        try:
+            await prefetch_bestof_clips(
+                since=next_bestof_window_start(), catalog_lock=catalog_lock
+            )
+        except Exception as e:
+            print(f"Erreur lors du préchargement des clips: {e}")
 
 
 async def main():
-    global running
-
     # Analyser les arguments de ligne de commande
     parser = argparse.ArgumentParser(
         description="BestOfMaker - Génère des best-of de clips Twitch"
@@ -77,6 +131,16 @@ async def main():
         default=20,
         help="Nombre de clips à inclure dans le best-of (défaut: 20)",
     )
+    parser.add_argument(
+        "--harvest",
+        action="store_true",
+        help="Mettre à jour le catalogue local de clips puis quitter",
+    )
+    parser.add_argument(
+        "--prefetch",
+        action="store_true",
+        help="Précharger les clips candidats au prochain best-of puis quitter",
+    )
     parser.add_argument(
         "--monitor",
         action="store_true",
@@ -88,7 +152,23 @@ async def main():
     if args.bestof:
         print(f"=== BestOfMaker - Génération de best-of à la demande ===")
         print(f"Nombre de clips demandés: {args.clips}")
-        await generate_weekly_bestof(total_bestof_clips=args.clips)
+        await generate_weekly_bestof(
+            total_bestof_clips=args.clips, game_id=GAME_ID, search_terms=SEARCH_TERMS
+        )
+        return
+
+    # Mode récolte incrémentale uniquement
+    if args.harvest:
+        print(f"=== BestOfMaker - Récolte incrémentale des clips ===")
+        await update_clip_catalog(game_id=GAME_ID, search_terms=SEARCH_TERMS)
+        return
+
+    # Mode préchargement uniquement
+    if args.prefetch:
+        print(f"=== BestOfMaker - Préchargement des clips candidats ===")
+        await prefetch_bestof_clips(
+            total_bestof_clips=args.clips, since=next_bestof_window_start()
+        )
         return
 
     # Mode surveillance uniquement
@@ -96,7 +176,10 @@ async def main():
         print(f"=== BestOfMaker - Mode surveillance uniquement ===")
         print(f"Surveillance des streamers pour les termes: {', '.join(SEARCH_TERMS)}")
         await monitor_streamers(
-            GAME_ID, SEARCH_TERMS, interval_minutes=CHECK_INTERVAL_MINUTES
+            GAME_ID,
+            SEARCH_TERMS,
+            interval_minutes=CHECK_INTERVAL_MINUTES,
+            min_viewers=MIN_VIEWERS,
         )
         return
 
@@ -106,26 +189,48 @@ async def main():
     print(f"Génération du best-of hebdomadaire prévue chaque {BESTOF_DAY}")
     print(f"Utilisez Ctrl+C pour arrêter le programme, ou:")
     print(f"  --bestof pour générer immédiatement un best-of")
+    print(f"  --harvest pour mettre à jour le catalogue de clips")
+    print(f"  --prefetch pour précharger les clips candidats")
     print(f"  --monitor pour lancer uniquement la surveillance")
 
-    # Planifier la génération du best-of hebdomadaire
-    schedule.every().sunday.at("00:00").do(run_bestof_generator)
-
-    # Démarrer le planificateur dans un thread séparé
-    scheduler_thread = threading.Thread(target=run_scheduler)
-    scheduler_thread.daemon = True
-    scheduler_thread.start()
-
-    # Configurer le gestionnaire de signal
-    signal.signal(signal.SIGINT, signal_handler)
-
-    # Lancer la surveillance des streamers (s'exécute indéfiniment jusqu'à interruption)
-    await monitor_streamers(
-        GAME_ID,
-        SEARCH_TERMS,
-        interval_minutes=CHECK_INTERVAL_MINUTES,
-    )
+    # Une seule connexion Twitch et un seul budget de requêtes pour toutes les tâches
+    twitch = await login()
+    rate_limiter = create_helix_rate_limiter()
+    # La récolte et la génération écrivent toutes deux le catalogue de clips
+    catalog_lock = asyncio.Lock()
+
+    # Arrêter proprement toutes les tâches sur Ctrl+C ou SIGTERM
+    loop = asyncio.get_running_loop()
+    main_task = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, main_task.cancel)
+        except NotImplementedError:
+            # add_signal_handler n'est pas disponible sous Windows
+            pass
+
+    try:
+        # Surveillance, récolte et génération coopèrent sur la même boucle asyncio
+        await asyncio.gather(
+            monitor_streamers(
+                GAME_ID,
+                SEARCH_TERMS,
+                interval_minutes=CHECK_INTERVAL_MINUTES,
+                min_viewers=MIN_VIEWERS,
+                rate_limiter=rate_limiter,
+                twitch=twitch,
+            ),
+            harvest_scheduler(twitch, rate_limiter, catalog_lock),
+            bestof_scheduler(twitch, rate_limiter, catalog_lock),
+        )
+    except asyncio.CancelledError:
+        print("\nArrêt du programme en cours...")
+    finally:
+        await twitch.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Callable, Optional
+from src.clip_cache import file_sha256
+from src.media_probe import get_probe_cache, probe_media
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+# Dossier des vidéos fixes (intro, outro, transition) déjà normalisées
+ASSET_CACHE_DIR = "data/asset_cache"
+
+
+def profile_key(profile) -> str:
+    """
+    Empreinte courte d'un profil de sortie. Le nombre de threads de
+    l'encodeur n'influe pas sur le fichier produit : il est ignoré.
+    """
+    fields = {name: value for name, value in asdict(profile).items() if name != "threads"}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class AssetCache:
+    """
+    Cache des vidéos fixes normalisées, prêtes à être concaténées.
+
+    Une entrée est indexée par l'empreinte SHA-256 du fichier source et par le
+    profil de sortie : une vidéo modifiée ou un profil différent produisent une
+    nouvelle entrée. L'index garde la durée de chaque version normalisée, et
+    l'empreinte des sources (revalidée par taille et date de modification) pour
+    ne pas relire les fichiers à chaque exécution.
+    """
+
+    def __init__(self, cache_dir: str = ASSET_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, ".lock")
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @contextmanager
+    def _locked_index(self):
+        """Verrouille le cache et fournit l'index, réécrit de façon atomique à la sortie."""
+        with open(self.lock_path, "a+") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                index = self._read_index()
+                yield index
+                tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(index, f)
+                os.replace(tmp_path, self.index_path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {"assets": {}, "sources": {}}
+        try:
+            with open(self.index_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Erreur lors de la lecture de l'index des vidéos fixes: {e}")
+            return {"assets": {}, "sources": {}}
+
+    def _source_hash(self, source_path: str) -> str:
+        """Empreinte du fichier source, recalculée seulement si sa taille ou sa date changent."""
+        stat = os.stat(source_path)
+        key = os.path.abspath(source_path)
+        known = self._read_index()["sources"].get(key)
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+            return known["sha256"]
+        checksum = file_sha256(source_path)
+        with self._locked_index() as index:
+            index["sources"][key] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": checksum,
+            }
+        return checksum
+
+    def lookup(self, source_path: str, profile) -> Optional[dict]:
+        """Retourne l'entrée {"path", "duration"} de la version normalisée, si elle existe."""
+        key = f"{self._source_hash(source_path)}_{profile_key(profile)}"
+        entry = self._read_index()["assets"].get(key)
+        if entry and os.path.exists(entry["path"]):
+            return entry
+        return None
+
+    def get(
+        self,
+        source_path: str,
+        profile,
+        render: Callable[[str, str, Optional[str], object], str],
+    ) -> Optional[dict]:
+        """
+        Retourne la version normalisée d'une vidéo fixe, en la rendant une seule fois.
+
+        Args:
+            source_path: Vidéo fixe (intro, outro, transition)
+            profile: Profil de sortie
+            render: Fonction de rendu (source, destination, tag, profil) -> chemin ou ""
+
+        Returns:
+            Entrée {"path", "duration", "source"}, ou None si le rendu a échoué
+        """
+        entry = self.lookup(source_path, profile)
+        if entry:
+            return entry
+
+        key = f"{self._source_hash(source_path)}_{profile_key(profile)}"
+        path = os.path.join(self.cache_dir, f"{key}.mp4")
+        tmp_path = os.path.join(self.cache_dir, f"{key}.{os.getpid()}.tmp.mp4")
+        print(f"Normalisation de {source_path} pour le cache des vidéos fixes...")
+        if not render(source_path, tmp_path, None, profile):
+            return None
+        try:
+            info = probe_media(tmp_path)
+        except ValueError as e:
+            print(f"Vidéo fixe normalisée illisible ({source_path}): {e}")
+            os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, path)
+        # Le renommage garde taille et date : l'analyse reste valable pour le fichier final
+        get_probe_cache().remember(path, info)
+        duration = info.duration
+
+        entry = {"path": path, "duration": duration, "source": source_path}
+        with self._locked_index() as index:
+            index["assets"][key] = entry
+        return entry
+
+    def get_duration(self, source_path: str, profile) -> float:
+        """
+        Durée d'une vidéo fixe dans le best-of : celle de sa version normalisée si
+        elle est en cache, sinon celle annoncée par le conteneur source (sans décodage).
+        """
+        if not os.path.exists(source_path):
+            return 0.0
+        entry = self.lookup(source_path, profile)
+        if entry:
+            return entry["duration"]
+        try:
+            return get_probe_cache().probe(source_path).duration
+        except ValueError as e:
+            print(f"Erreur lors de la lecture de la durée de {source_path}: {e}")
+            return 0.0
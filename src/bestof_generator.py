@@ -1,101 +1,109 @@
 import asyncio
 import json
 import os
-import shutil
-from datetime import datetime, timedelta
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from twitchAPI.twitch import Twitch
 from src.twitchClips import (
     login,
-    get_clips_with_term,
-    get_broadcaster_id,
-    download_clip,
     Clip,
 )
-from src.videoAssembler import concatClips, INTRO_PATH
+from src.clip_cache import ClipCache
+from src.clip_harvester import harvest_incremental, HARVEST_CONCURRENCY
+from src.clip_catalog import ClipCatalog
+from src.clip_selection import TopKClips
+from src.streamer_registry import StreamerRegistry
+from src.rate_limiter import TokenBucket
+from src.videoAssembler import INTRO_PATH, TRANSI_PATH, DEFAULT_PROFILE
+from src.asset_cache import AssetCache
+from src.render_pipeline import render_bestof_pipeline
 from src.youtube_publisher import publish_youtube_video
 from src.miniature_generator import generate_youtube_thumbnail
-from moviepy import VideoFileClip
 
 
-# Fichier pour stocker les streamers identifiés
-STREAMERS_FILE = "data/tracked_streamers.json"
 # Dossier pour stocker les best-of
 BESTOF_DIR = "bestof"
+# Seuls les streamers vus en direct pendant cette période (en jours) sont interrogés
+ACTIVE_WINDOW_DAYS = 14
 
 
 async def generate_weekly_bestof(
-    max_clips_per_streamer: int = 30, total_bestof_clips: int = 20
+    max_clips_per_streamer: int = 30,
+    total_bestof_clips: int = 20,
+    harvest_concurrency: int = HARVEST_CONCURRENCY,
+    game_id: Optional[str] = None,
+    search_terms: Optional[list[str]] = None,
+    active_within_days: Optional[int] = ACTIVE_WINDOW_DAYS,
+    twitch: Optional[Twitch] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+    catalog_lock: Optional[asyncio.Lock] = None,
 ):
     """
     Génère un best-of hebdomadaire à partir des clips des streamers suivis.
 
+    Les téléchargements passent par des sous-processus asyncio, et les étapes
+    bloquantes (assemblage, miniature, publication) sont exécutées hors de la
+    boucle asyncio partagée.
+
     Args:
         max_clips_per_streamer: Nombre maximum de clips à récupérer par streamer
         total_bestof_clips: Nombre total de clips à inclure dans le best-of final
+        harvest_concurrency: Nombre de streamers interrogés en parallèle
+        game_id: ID du jeu, permet un balayage unique du jeu si beaucoup de streamers sont suivis
+        search_terms: Termes recherchés dans le titre des clips lors du balayage du jeu
+        active_within_days: Ignore les streamers non vus en direct depuis ce nombre de jours (None: tous)
+        twitch: Instance Twitch authentifiée partagée (une connexion est ouverte si absente)
+        rate_limiter: Limiteur partagé des requêtes Helix (optionnel)
+        catalog_lock: Verrou du catalogue de clips, tenu seulement pendant la récolte
+            et la sélection (optionnel)
     """
     print(f"Démarrage de la génération du best-of hebdomadaire...")
 
-    # Vérifier que le fichier des streamers existe
-    if not os.path.exists(STREAMERS_FILE):
-        print(f"Erreur: Fichier de suivi des streamers {STREAMERS_FILE} introuvable.")
-        return
-
     # Créer le dossier bestof s'il n'existe pas
     os.makedirs(BESTOF_DIR, exist_ok=True)
 
-    # Créer un dossier temporaire pour les clips
-    temp_dir = f"{BESTOF_DIR}/temp"
-    os.makedirs(temp_dir, exist_ok=True)
-
-    # Charger la liste des streamers suivis
-    tracked_streamers = load_tracked_streamers()
+    # Charger la liste des streamers suivis et actifs
+    tracked_streamers = load_tracked_streamers(active_within_days)
     if not tracked_streamers:
         print("Aucun streamer suivi trouvé.")
         return
 
     print(f"Génération du best-of pour {len(tracked_streamers)} streamers suivis.")
 
-    # Se connecter à l'API Twitch
-    twitch = await login()
-
-    # Récupérer tous les clips des streamers suivis
-    all_clips = []
-
-    for streamer in tracked_streamers:
-        try:
-            print(f"Récupération des clips pour {streamer}...")
-
-            # Obtenir l'ID du streamer
-            broadcaster_id = await get_broadcaster_id(twitch, streamer)
-
-            # Récupérer les clips du streamer
-            streamer_clips = await get_clips_with_term(
-                twitch,
-                broadcaster_id=broadcaster_id,
-                term="",
-                first_count=max_clips_per_streamer,
-            )
-
-            print(f"Récupéré {len(streamer_clips)} clips pour {streamer}")
-            all_clips.extend(streamer_clips)
-
-            # Petit délai entre chaque streamer
-            await asyncio.sleep(2)
-
-        except Exception as e:
-            print(f"Erreur lors de la récupération des clips pour {streamer}: {e}")
-
-    # D'abord trier tous les clips par nombre de vues (du plus vu au moins vu)
-    all_clips.sort(key=lambda clip: clip.view_count, reverse=True)
-
-    # Sélectionner les X meilleurs clips basés sur le nombre de vues
-    best_clips = all_clips[:total_bestof_clips]
+    # Se connecter à l'API Twitch si aucune instance n'est partagée
+    if twitch is None:
+        twitch = await login()
+
+    # Le catalogue n'est verrouillé que le temps de la récolte et de la sélection
+    async with catalog_lock or nullcontext():
+        # Compléter le catalogue local avec les clips créés depuis la dernière récolte
+        catalog = ClipCatalog()
+        await harvest_incremental(
+            twitch,
+            tracked_streamers,
+            catalog,
+            max_clips_per_streamer=max_clips_per_streamer,
+            concurrency=harvest_concurrency,
+            game_id=game_id,
+            terms=search_terms,
+            top_k_size=total_bestof_clips,
+            rate_limiter=rate_limiter,
+        )
+        catalog.save()
+
+        # Sélectionner les X clips les plus vus de la semaine, lus depuis le catalogue
+        last_week = datetime.now(timezone.utc) - timedelta(days=7)
+        top_clips = TopKClips(total_bestof_clips)
+        top_clips.extend(catalog.iter_clips_since(last_week))
+        best_clips = top_clips.results()
 
     if not best_clips:
         print("Aucun clip trouvé pour générer le best-of.")
         return
 
     print(
-        f"\nSélection des {len(best_clips)} meilleurs clips sur {len(all_clips)} clips récupérés."
+        f"\nSélection des {len(best_clips)} meilleurs clips sur {top_clips.seen} clips récupérés."
     )
     print("Clips sélectionnés (par nombre de vues):")
     for i, clip in enumerate(
@@ -117,59 +125,30 @@ async def generate_weekly_bestof(
     if len(best_clips) > 5:
         print(f"  ... et {len(best_clips) - 5} autres clips")
 
-    # Télécharger les clips
-    downloaded_paths = []
-
-    for i, clip in enumerate(best_clips):
-        try:
-            print(
-                f"Téléchargement du clip {i+1}/{len(best_clips)}: {clip.title} ({clip.view_count} vues)..."
-            )
-
-            # Générer un nom de fichier basé sur l'ordre et l'ID du clip
-            save_path = f"{temp_dir}/{i+1:02d}_{clip.id}.mp4"
-
-            success = download_clip(clip.url, save_path)
-
-            if success:
-                downloaded_paths.append((save_path, clip.broadcaster_name))
-
-            # Petit délai entre téléchargements
-            await asyncio.sleep(1)
-
-        except Exception as e:
-            print(f"Erreur lors du téléchargement du clip {clip.url}: {e}")
-
     # Générer le nom du fichier best-of avec la date
     date_str = datetime.now().strftime("%Y-%m-%d")
     bestof_file = f"{BESTOF_DIR}/bestof_{date_str}.mp4"
 
-    # Assembler les clips téléchargés
-    if downloaded_paths:
-        print(f"\nAssemblage de {len(downloaded_paths)} clips en une vidéo best-of...")
-
-        # Trier les chemins par nom de fichier pour respecter l'ordre
-        downloaded_paths.sort()
-
-        # final_path = concatClips(downloaded_paths, bestof_file)
-        final_path = "bestof/bestof_2025-06-10.mp4"
-
-        if final_path:
-            print(f"Best-of hebdomadaire créé avec succès: {final_path}")
+    # Télécharger (via le cache), normaliser et assembler les clips en pipeline :
+    # chaque clip est rendu dès son arrivée et l'assemblage suit dans l'ordre
+    print(f"\nAssemblage de {len(best_clips)} clips en une vidéo best-of...")
+    final_path, rendered_clips, timecodes = await render_bestof_pipeline(
+        best_clips, bestof_file, cache=ClipCache()
+    )
+    if final_path:
+        print(f"Best-of hebdomadaire créé avec succès: {final_path}")
 
-            # Enregistrer les métadonnées du best-of
-            bestof_metadata = save_bestof_metadata(best_clips, final_path, date_str)
-        else:
-            print("Échec de la création du best-of.")
+        # Enregistrer les métadonnées du best-of (clips réellement présents dans la vidéo)
+        bestof_metadata = await asyncio.to_thread(
+            save_bestof_metadata, rendered_clips, final_path, date_str, timecodes
+        )
     else:
-        print("Aucun clip téléchargé, impossible de créer le best-of.")
+        print("Échec de la création du best-of.")
 
-    # Nettoyage du dossier temporaire
-    if os.path.exists(temp_dir):
-        shutil.rmtree(temp_dir)
-        print(f"Dossier temporaire {temp_dir} supprimé.")
+    if not final_path:
+        return
 
-    most_viewed_clip = max(best_clips, key=lambda clip: clip.view_count)
+    most_viewed_clip = max(rendered_clips, key=lambda clip: clip.view_count)
 
     # Calculer le lundi de la semaine pour la date donnée
     date_obj = datetime.strptime(date_str, "%Y-%m-%d")
@@ -180,13 +159,15 @@ async def generate_weekly_bestof(
         "%Y-%m-%d"
     )  # Convertir la date au format YYYY-MM-DD pour la miniature
 
-    generate_youtube_thumbnail(
+    await asyncio.to_thread(
+        generate_youtube_thumbnail,
         image_path=most_viewed_clip.thumbnail_url,
         date_str=formatted_week_date,
         output_path=f"bestof/bestof_{thunbailformatted_date}.png",
     )
 
-    publish_youtube_video(
+    await asyncio.to_thread(
+        publish_youtube_video,
         title=bestof_metadata["youtube_title"],
         description=bestof_metadata["youtube_description"],
         video_path=bestof_file,
@@ -194,19 +175,72 @@ async def generate_weekly_bestof(
     )
 
 
-def load_tracked_streamers() -> list:
-    """Charge la liste des streamers suivis depuis le fichier JSON."""
-    if os.path.exists(STREAMERS_FILE):
-        try:
-            with open(STREAMERS_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Erreur lors du chargement des streamers suivis: {e}")
-    return []
+async def update_clip_catalog(
+    max_clips_per_streamer: int = 30,
+    harvest_concurrency: int = HARVEST_CONCURRENCY,
+    game_id: Optional[str] = None,
+    search_terms: Optional[list[str]] = None,
+    active_within_days: Optional[int] = ACTIVE_WINDOW_DAYS,
+    twitch: Optional[Twitch] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+):
+    """
+    Effectue une passe de récolte incrémentale des clips des streamers suivis.
+    Prévu pour tourner chaque jour (ou chaque heure) afin d'étaler la récolte sur la semaine.
+    """
+    tracked_streamers = load_tracked_streamers(active_within_days)
+    if not tracked_streamers:
+        print("Aucun streamer suivi trouvé.")
+        return
+
+    if twitch is None:
+        twitch = await login()
+    catalog = ClipCatalog()
+    await harvest_incremental(
+        twitch,
+        tracked_streamers,
+        catalog,
+        max_clips_per_streamer=max_clips_per_streamer,
+        concurrency=harvest_concurrency,
+        game_id=game_id,
+        terms=search_terms,
+        rate_limiter=rate_limiter,
+    )
+    catalog.save()
 
 
-def save_bestof_metadata(clips: list[Clip], file_path: str, date_str: str) -> dict:
-    """Enregistre les métadonnées du best-of dans un fichier JSON avec timecodes."""
+def load_tracked_streamers(active_within_days: Optional[int] = None) -> list:
+    """
+    Charge la liste des streamers suivis depuis le registre (instantané + journal).
+    Si `active_within_days` est fourni, ne garde que ceux vus en direct sur cette période.
+    """
+    registry = StreamerRegistry()
+    if active_within_days is None:
+        return registry.streamers
+    active_streamers = registry.active_streamers(active_within_days * 24 * 3600)
+    print(
+        f"{len(active_streamers)} streamers actifs sur les {active_within_days} derniers jours "
+        f"({len(registry) - len(active_streamers)} inactifs ignorés)"
+    )
+    return active_streamers
+
+
+def save_bestof_metadata(
+    clips: list[Clip],
+    file_path: str,
+    date_str: str,
+    timecodes: Optional[list[float]] = None,
+) -> dict:
+    """
+    Enregistre les métadonnées du best-of dans un fichier JSON avec timecodes.
+
+    Args:
+        clips: Clips présents dans la vidéo, dans l'ordre
+        file_path: Fichier vidéo du best-of
+        date_str: Date du best-of (YYYY-MM-DD)
+        timecodes: Début de chaque clip dans la vidéo, d'après la durée réelle des
+            segments assemblés. Estimés depuis les durées connues si absents.
+    """
 
     def format_timecode(seconds):
         minutes = int(seconds // 60)
@@ -228,21 +262,19 @@ def save_bestof_metadata(clips: list[Clip], file_path: str, date_str: str) -> di
             "timecode": format_timecode(timecode),  # timecode au format mm:ss
         }
 
-    # Récupérer la durée de l'intro si elle existe
-    intro_duration = 0.0
-    if os.path.exists(INTRO_PATH):
-        try:
-            with VideoFileClip(INTRO_PATH) as intro_clip:
-                intro_duration = intro_clip.duration
-        except Exception as e:
-            print(f"Erreur lors de la lecture de la durée de l'intro: {e}")
-
-    # Calculer les timecodes pour chaque clip (en tenant compte de l'intro)
-    timecodes = []
-    current_time = intro_duration
-    for clip in clips:
-        timecodes.append(current_time)
-        current_time += getattr(clip, "duration", 0)
+    if timecodes is None:
+        # Estimation : intro et transitions lues dans le cache des vidéos fixes,
+        # durée des clips annoncée par Twitch
+        asset_cache = AssetCache()
+        intro_duration = asset_cache.get_duration(INTRO_PATH, DEFAULT_PROFILE)
+        transition_duration = asset_cache.get_duration(TRANSI_PATH, DEFAULT_PROFILE)
+        timecodes = []
+        current_time = intro_duration
+        for clip in clips:
+            if intro_duration or timecodes:
+                current_time += transition_duration
+            timecodes.append(current_time)
+            current_time += getattr(clip, "duration", 0)
 
     # Générer le titre YouTube avec le clip le plus vu
     most_viewed_clip = max(clips, key=lambda clip: clip.view_count)
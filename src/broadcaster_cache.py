@@ -0,0 +1,81 @@
+import json
+import os
+import time
+from typing import Optional
+
+# Fichier pour stocker la correspondance login -> ID des streamers
+BROADCASTER_IDS_FILE = "data/broadcaster_ids.json"
+# Durée de validité d'un ID résolu (les IDs Twitch ne changent pas)
+POSITIVE_TTL_SECONDS = 30 * 24 * 3600
+# Durée de validité d'un échec (compte renommé ou banni), revérifié plus souvent
+NEGATIVE_TTL_SECONDS = 24 * 3600
+
+
+class BroadcasterIdCache:
+    """
+    Cache persistant login -> ID de streamer, avec expiration.
+
+    Les logins introuvables sont aussi mémorisés (ID à None) pour ne pas
+    les redemander à chaque exécution.
+    """
+
+    def __init__(
+        self,
+        path: str = BROADCASTER_IDS_FILE,
+        positive_ttl: float = POSITIVE_TTL_SECONDS,
+        negative_ttl: float = NEGATIVE_TTL_SECONDS,
+    ):
+        self.path = path
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: dict[str, dict] = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """Charge le cache depuis le disque (un fichier absent ou corrompu donne un cache vide)."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                self._entries = json.load(f)
+        except Exception as e:
+            print(f"Erreur lors du chargement du cache des IDs de streamers: {e}")
+            self._entries = {}
+
+    def save(self):
+        """Enregistre le cache sur le disque s'il a été modifié."""
+        if not self._dirty:
+            return
+        parent_dir = os.path.dirname(self.path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement du cache des IDs de streamers: {e}")
+
+    def lookup(self, login: str) -> tuple[bool, Optional[str]]:
+        """
+        Cherche un login dans le cache.
+
+        Returns:
+            (trouvé, ID) : trouvé vaut False si l'entrée est absente ou expirée,
+            l'ID vaut None pour un login mémorisé comme introuvable
+        """
+        entry = self._entries.get(login.lower())
+        if entry is None:
+            return False, None
+        ttl = self.positive_ttl if entry.get("id") else self.negative_ttl
+        if time.time() - entry.get("resolved_at", 0) > ttl:
+            return False, None
+        return True, entry.get("id")
+
+    def store(self, login: str, broadcaster_id: Optional[str]):
+        """Mémorise l'ID d'un login, ou None s'il est introuvable."""
+        self._entries[login.lower()] = {"id": broadcaster_id, "resolved_at": time.time()}
+        self._dirty = True
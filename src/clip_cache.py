@@ -0,0 +1,324 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Awaitable, Callable, Optional
+from src.clip_downloader import download_clips
+from src.media_probe import MediaInfo, media_info_from_dict, verify_clip_file
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+# Dossier du cache persistant des clips téléchargés
+CLIP_CACHE_DIR = "data/clip_cache"
+# Espace disque maximum occupé par le cache, en octets
+CLIP_CACHE_MAX_BYTES = int(os.getenv("CLIP_CACHE_MAX_BYTES", str(20 * 1024**3)))
+# Un clip utilisé récemment n'est jamais évincé (il peut être en cours d'assemblage par une autre exécution)
+EVICTION_GRACE_SECONDS = 3600
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ClipCache:
+    """
+    Cache persistant des clips téléchargés, indexé par ID de clip Twitch.
+
+    Un manifeste JSON garde pour chaque clip sa taille, sa durée, son empreinte
+    SHA-256, les caractéristiques lues à la vérification du fichier et sa date
+    de dernier accès. Quand le budget disque est dépassé, les
+    clips les moins récemment utilisés sont supprimés. Le manifeste est toujours
+    relu et réécrit sous un verrou de fichier, ce qui permet à plusieurs
+    exécutions de partager le même cache. Les méthodes synchrones font des
+    entrées/sorties bloquantes : `ensure` les exécute hors de la boucle asyncio.
+    """
+
+    def __init__(self, cache_dir: str = CLIP_CACHE_DIR, max_bytes: int = CLIP_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(cache_dir, "manifest.json")
+        self.lock_path = os.path.join(cache_dir, ".lock")
+        self.staging_dir = os.path.join(cache_dir, "staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    @contextmanager
+    def _locked_manifest(self):
+        """Verrouille le cache et fournit le manifeste, réécrit de façon atomique à la sortie."""
+        with open(self.lock_path, "a+") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                manifest = self._read_manifest()
+                yield manifest
+                tmp_path = f"{self.manifest_path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(manifest, f)
+                os.replace(tmp_path, self.manifest_path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Erreur lors de la lecture du manifeste du cache de clips: {e}")
+            return {}
+
+    def _clip_path(self, clip_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{clip_id}.mp4")
+
+    def _valid_path(self, clip_id: str, entry: Optional[dict]) -> Optional[str]:
+        """Chemin du clip si son entrée existe et que le fichier n'a pas été supprimé ou modifié hors du cache."""
+        if entry is None:
+            return None
+        path = self._clip_path(clip_id)
+        if not os.path.exists(path) or os.path.getsize(path) != entry.get("size"):
+            return None
+        return path
+
+    def get(self, clip_id: str) -> Optional[str]:
+        """Retourne le chemin du clip s'il est en cache, sans réécrire le manifeste (voir `touch`)."""
+        return self._valid_path(clip_id, self._read_manifest().get(clip_id))
+
+    def lookup(self, clip_ids: list[str]) -> dict[str, str]:
+        """
+        Retourne les chemins des clips présents dans le cache, en une seule lecture
+        du manifeste. Les entrées dont le fichier n'est plus valable sont retirées,
+        et la date d'accès des clips trouvés est mise à jour.
+        """
+        manifest = self._read_manifest()
+        paths = {}
+        stale = []
+        for clip_id in clip_ids:
+            if clip_id not in manifest:
+                continue
+            path = self._valid_path(clip_id, manifest[clip_id])
+            if path:
+                paths[clip_id] = path
+            else:
+                stale.append(clip_id)
+        if paths or stale:
+            self.touch(list(paths), stale)
+        return paths
+
+    def touch(self, clip_ids: list[str], stale_ids: Optional[list[str]] = None):
+        """Met à jour la date d'accès de clips utilisés et retire les entrées périmées, en une seule écriture."""
+        now = time.time()
+        with self._locked_manifest() as manifest:
+            for clip_id in clip_ids:
+                if clip_id in manifest:
+                    manifest[clip_id]["last_access"] = now
+            for clip_id in stale_ids or []:
+                manifest.pop(clip_id, None)
+
+    def get_entry(self, clip_id: str) -> Optional[dict]:
+        """Retourne l'entrée du manifeste pour un clip, sans la modifier."""
+        return self._read_manifest().get(clip_id)
+
+    def get_media_info(self, clip_id: str) -> Optional[MediaInfo]:
+        """Retourne les caractéristiques du clip lues lors de sa vérification, sans relire le fichier."""
+        entry = self.get_entry(clip_id)
+        if not entry or not entry.get("media"):
+            return None
+        return media_info_from_dict(entry["media"])
+
+    def put(self, clip_id: str, source_path: str, duration: float = 0, **metadata) -> str:
+        """
+        Déplace un fichier téléchargé dans le cache et l'enregistre dans le manifeste.
+
+        Returns:
+            Chemin du clip dans le cache
+        """
+        size = os.path.getsize(source_path)
+        checksum = file_sha256(source_path)
+        path = self._clip_path(clip_id)
+        with self._locked_manifest() as manifest:
+            os.replace(source_path, path)
+            manifest[clip_id] = {
+                "size": size,
+                "duration": duration,
+                "sha256": checksum,
+                "last_access": time.time(),
+                **metadata,
+            }
+            self._evict(manifest)
+        return path
+
+    def discard(self, clip_id: str):
+        """Supprime un clip du cache."""
+        with self._locked_manifest() as manifest:
+            if manifest.pop(clip_id, None) is not None:
+                self._remove_file(clip_id)
+
+    def entries(self) -> dict[str, dict]:
+        """Retourne une copie du manifeste : ID du clip -> entrée."""
+        return self._read_manifest()
+
+    def _remove_file(self, clip_id: str):
+        try:
+            os.remove(self._clip_path(clip_id))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, manifest: dict):
+        """Supprime les clips les moins récemment utilisés jusqu'à respecter le budget disque."""
+        total = sum(entry.get("size", 0) for entry in manifest.values())
+        if total <= self.max_bytes:
+            return
+        now = time.time()
+        for clip_id, entry in sorted(
+            manifest.items(), key=lambda item: item[1].get("last_access", 0)
+        ):
+            if total <= self.max_bytes:
+                break
+            if now - entry.get("last_access", 0) < EVICTION_GRACE_SECONDS:
+                break
+            self._remove_file(clip_id)
+            total -= entry.get("size", 0)
+            del manifest[clip_id]
+            print(f"Clip {clip_id} évincé du cache ({entry.get('size', 0) / (1024 * 1024):.1f} Mo)")
+
+    def _lock_download(self, clip_id: str, blocking: bool):
+        """
+        Verrouille le téléchargement d'un clip entre exécutions concurrentes.
+        Retourne le fichier de verrou à fermer, ou None s'il est déjà pris (mode non bloquant).
+        """
+        lock_file = open(os.path.join(self.staging_dir, f"{clip_id}.lock"), "a+")
+        if fcntl:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return None
+        return lock_file
+
+    async def ensure(
+        self,
+        clips: list,
+        on_ready: Optional[Callable[[object, str], Awaitable[None]]] = None,
+        **metadata,
+    ) -> dict[str, str]:
+        """
+        Garantit la présence des clips dans le cache, en téléchargeant ceux qui manquent.
+
+        Chaque clip téléchargé est vérifié (flux, durée attendue, fin décodable)
+        avant d'entrer dans le cache. Le fichier partiel d'un téléchargement
+        interrompu est conservé et complété à l'exécution suivante. Un clip en
+        cours de téléchargement par une autre exécution est attendu.
+
+        Args:
+            clips: Objets Clip (id, url, duration)
+            on_ready: Coroutine appelée avec (clip, chemin) dès qu'un clip est disponible,
+                sans attendre la fin des autres téléchargements
+            metadata: Champs supplémentaires enregistrés pour les clips téléchargés
+
+        Returns:
+            Dictionnaire ID du clip -> chemin dans le cache, pour les clips disponibles
+        """
+        paths = await asyncio.to_thread(self.lookup, [clip.id for clip in clips])
+        missing = [clip for clip in clips if clip.id not in paths]
+        if paths:
+            print(f"{len(paths)} clips déjà présents dans le cache")
+
+        feeder = None
+        if on_ready:
+            cached = [(clip, paths[clip.id]) for clip in clips if clip.id in paths]
+
+            async def feed_cached():
+                for clip, path in cached:
+                    await on_ready(clip, path)
+
+            if not missing:
+                await feed_cached()
+                return paths
+            # Les clips en cache sont transmis dans une tâche à part : si on_ready attend
+            # (file bornée pleine), les téléchargements manquants ont déjà démarré
+            feeder = asyncio.create_task(feed_cached())
+        if not missing:
+            return paths
+
+        try:
+            await self._download_missing(missing, paths, on_ready, metadata)
+        except BaseException:
+            if feeder is not None:
+                feeder.cancel()
+            raise
+        if feeder is not None:
+            await feeder
+        return paths
+
+    async def _download_missing(
+        self,
+        missing: list,
+        paths: dict[str, str],
+        on_ready: Optional[Callable[[object, str], Awaitable[None]]],
+        metadata: dict,
+    ):
+        """Télécharge les clips absents du cache et complète `paths` (voir `ensure`)."""
+
+        locks = {}
+        busy = []
+        for clip in missing:
+            lock_file = self._lock_download(clip.id, blocking=False)
+            if lock_file is None:
+                busy.append(clip)
+            else:
+                locks[clip.id] = lock_file
+
+        try:
+            to_download = [clip for clip in missing if clip.id in locks]
+            expected_durations = {
+                clip.url: getattr(clip, "duration", 0) for clip in to_download
+            }
+
+            async def store(index: int, result):
+                if not result.success:
+                    return
+                clip = to_download[index]
+                # Empreinte SHA-256 et manifeste : hors de la boucle asyncio partagée
+                paths[clip.id] = await asyncio.to_thread(
+                    self.put,
+                    clip.id,
+                    result.path,
+                    duration=result.info.duration,
+                    media=asdict(result.info),
+                    **metadata,
+                )
+                if on_ready:
+                    await on_ready(clip, paths[clip.id])
+
+            await download_clips(
+                [
+                    (clip.url, os.path.join(self.staging_dir, f"{clip.id}.mp4"))
+                    for clip in to_download
+                ],
+                verify=lambda url, path: verify_clip_file(path, expected_durations[url]),
+                on_complete=store,
+            )
+        finally:
+            for lock_file in locks.values():
+                lock_file.close()
+
+        for clip in busy:
+            print(f"Clip {clip.id} en cours de téléchargement par une autre exécution, attente...")
+            lock_file = await asyncio.to_thread(self._lock_download, clip.id, True)
+            lock_file.close()
+            path = (await asyncio.to_thread(self.lookup, [clip.id])).get(clip.id)
+            if path:
+                paths[clip.id] = path
+                if on_ready:
+                    await on_ready(clip, path)
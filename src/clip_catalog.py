@@ -0,0 +1,128 @@
+import json
+import os
+from dataclasses import asdict
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from src.twitchClips import Clip
+
+# Fichier du catalogue local des clips récoltés
+CLIP_CATALOG_FILE = "data/clip_catalog.json"
+
+
+def parse_created_at(value) -> datetime:
+    """Convertit une date de création (datetime ou chaîne ISO) en datetime UTC."""
+    if isinstance(value, datetime):
+        created_at = value
+    else:
+        try:
+            created_at = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return datetime.min.replace(tzinfo=timezone.utc)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at
+
+
+class ClipCatalog:
+    """
+    Catalogue local des clips des streamers suivis.
+
+    Garde pour chaque streamer un "watermark" : la date de fin de la dernière
+    récolte. La récolte suivante ne demande alors que l'intervalle manquant.
+    """
+
+    def __init__(self, path: str = CLIP_CATALOG_FILE):
+        self.path = path
+        self.clips: dict[str, dict] = {}
+        self.watermarks: dict[str, str] = {}
+        self.load()
+
+    def load(self):
+        """Charge le catalogue depuis le disque (vide s'il n'existe pas encore)."""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.clips = data.get("clips", {})
+            self.watermarks = data.get("watermarks", {})
+        except Exception as e:
+            print(f"Erreur lors du chargement du catalogue de clips: {e}")
+
+    def save(self):
+        """Enregistre le catalogue via un fichier temporaire renommé (écriture atomique)."""
+        parent_dir = os.path.dirname(self.path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"clips": self.clips, "watermarks": self.watermarks},
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement du catalogue de clips: {e}")
+
+    def get_watermark(self, broadcaster_id: str) -> Optional[datetime]:
+        """Retourne la date jusqu'à laquelle les clips du streamer ont déjà été récoltés."""
+        watermark = self.watermarks.get(broadcaster_id)
+        return parse_created_at(watermark) if watermark else None
+
+    def set_watermark(self, broadcaster_id: str, when: datetime):
+        self.watermarks[broadcaster_id] = when.isoformat()
+
+    def upsert(self, clip: Clip):
+        """Ajoute un clip au catalogue ou met à jour ses métadonnées."""
+        entry = asdict(clip)
+        entry["created_at"] = parse_created_at(clip.created_at).isoformat()
+        self.clips[clip.id] = entry
+
+    def update_view_count(self, clip_id: str, view_count: int):
+        if clip_id in self.clips:
+            self.clips[clip_id]["view_count"] = view_count
+
+    def remove(self, clip_id: str):
+        self.clips.pop(clip_id, None)
+
+    def clip_ids_since(self, since: datetime) -> list[str]:
+        return [
+            clip_id
+            for clip_id, entry in self.clips.items()
+            if parse_created_at(entry["created_at"]) >= since
+        ]
+
+    def iter_clips_since(
+        self, since: datetime, broadcaster_ids: Optional[set[str]] = None
+    ) -> Iterator[Clip]:
+        """
+        Parcourt les clips créés depuis `since`.
+
+        Args:
+            since: Date de création minimale
+            broadcaster_ids: Si fourni, ne garde que les clips de ces streamers
+        """
+        for entry in self.clips.values():
+            if broadcaster_ids is not None and entry.get("broadcaster_id") not in broadcaster_ids:
+                continue
+            if parse_created_at(entry["created_at"]) >= since:
+                yield Clip(**entry)
+
+    def clips_since(
+        self, since: datetime, broadcaster_ids: Optional[set[str]] = None
+    ) -> list[Clip]:
+        """Retourne la liste des clips créés depuis `since`."""
+        return list(self.iter_clips_since(since, broadcaster_ids))
+
+    def prune(self, older_than: datetime) -> int:
+        """Supprime les clips créés avant `older_than` et retourne leur nombre."""
+        old_ids = [
+            clip_id
+            for clip_id, entry in self.clips.items()
+            if parse_created_at(entry["created_at"]) < older_than
+        ]
+        for clip_id in old_ids:
+            del self.clips[clip_id]
+        return len(old_ids)
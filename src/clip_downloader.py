@@ -0,0 +1,345 @@
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from src.rate_limiter import TokenBucket
+
+try:
+    import yt_dlp
+except ImportError:  # yt-dlp n'est alors utilisable qu'en ligne de commande
+    yt_dlp = None
+
+# Nombre de téléchargements simultanés
+DOWNLOAD_CONCURRENCY = 4
+# Bande passante totale autorisée en octets/s (0: illimitée)
+MAX_DOWNLOAD_BANDWIDTH = int(os.getenv("MAX_DOWNLOAD_BANDWIDTH", "0"))
+# Nombre de tentatives par clip et délai initial entre deux tentatives (doublé à chaque échec)
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_BACKOFF_SECONDS = 2.0
+# Taille des blocs lus sur le réseau
+CHUNK_SIZE = 256 * 1024
+# Options yt-dlp communes au moteur et à la ligne de commande
+YTDLP_OPTIONS = {
+    "noplaylist": True,
+    "geo_bypass": True,
+    "no_warnings": True,
+    "quiet": True,
+    "format": "best[ext=mp4]/best",
+}
+
+
+@dataclass
+class DownloadResult:
+    """Résultat du téléchargement d'un clip."""
+
+    url: str
+    path: str
+    success: bool
+    bytes: int = 0
+    seconds: float = 0.0
+    attempts: int = 0
+    error: str = ""
+    # Valeur retournée par la vérification du fichier (MediaInfo), si demandée
+    info: Any = None
+
+
+def find_downloaded_file(destination_file: str) -> Optional[str]:
+    """
+    Retourne le fichier réellement écrit pour `destination_file`.
+    yt-dlp peut changer l'extension : on cherche alors un fichier du même nom de base.
+    """
+    if os.path.exists(destination_file):
+        return destination_file
+    parent_dir = os.path.dirname(destination_file) or "."
+    base_name = os.path.basename(os.path.splitext(destination_file)[0])
+    for f in os.listdir(parent_dir):
+        path = os.path.join(parent_dir, f)
+        if os.path.isfile(path) and f.startswith(base_name) and not f.endswith(".part"):
+            return path
+    return None
+
+
+class DownloadEngine:
+    """
+    Moteur de téléchargement qui reste actif pendant toute l'exécution.
+
+    Au lieu de lancer un processus yt-dlp par clip, l'API Python de yt-dlp
+    résout l'URL MP4 directe du clip (une instance YoutubeDL par thread,
+    réutilisée), puis le fichier est récupéré via une session HTTP dont les
+    connexions sont réutilisées d'un clip à l'autre.
+    """
+
+    def __init__(self, pool_size: int = DOWNLOAD_CONCURRENCY):
+        self._local = threading.local()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def available(self) -> bool:
+        """Le moteur nécessite le module Python yt_dlp."""
+        return yt_dlp is not None
+
+    def _ydl(self):
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(YTDLP_OPTIONS)
+            self._local.ydl = ydl
+        return ydl
+
+    def resolve(self, url_clip: str) -> tuple[str, dict]:
+        """Retourne l'URL du fichier vidéo du clip et les en-têtes HTTP à utiliser."""
+        info = self._ydl().extract_info(url_clip, download=False)
+        direct_url = info.get("url")
+        if not direct_url and info.get("requested_formats"):
+            direct_url = info["requested_formats"][0].get("url")
+        if not direct_url:
+            raise ValueError(f"Aucune URL vidéo trouvée pour {url_clip}")
+        return direct_url, info.get("http_headers") or {}
+
+    def download(
+        self,
+        url_clip: str,
+        destination_file: str,
+        bandwidth: Optional[TokenBucket] = None,
+    ) -> int:
+        """
+        Télécharge un clip (une seule tentative) et retourne le nombre d'octets écrits.
+        Un fichier .part laissé par une tentative interrompue est complété (requête
+        HTTP Range) au lieu d'être téléchargé de nouveau. Lève une exception en cas d'échec.
+        """
+        parent_dir = os.path.dirname(destination_file)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+
+        direct_url, headers = self.resolve(url_clip)
+        part_file = f"{destination_file}.part"
+        offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+        if offset:
+            headers = {**headers, "Range": f"bytes={offset}-"}
+        written = 0
+        with self.session.get(direct_url, headers=headers, stream=True, timeout=30) as response:
+            if offset and response.status_code == 416:
+                # Le fichier partiel contient déjà tout le clip
+                os.replace(part_file, destination_file)
+                return 0
+            response.raise_for_status()
+            if offset and response.status_code != 206:
+                # Le serveur ignore la plage demandée : reprise depuis le début
+                offset = 0
+            if offset:
+                print(f"Reprise du téléchargement de {url_clip} à {offset / (1024 * 1024):.1f} Mo")
+            with open(part_file, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    if bandwidth:
+                        bandwidth.acquire_blocking(len(chunk))
+                    f.write(chunk)
+                    written += len(chunk)
+        os.replace(part_file, destination_file)
+        return written
+
+    def close(self):
+        self.session.close()
+
+
+_engine: Optional[DownloadEngine] = None
+
+
+def get_download_engine() -> DownloadEngine:
+    """Retourne le moteur de téléchargement partagé par tout le processus."""
+    global _engine
+    if _engine is None:
+        _engine = DownloadEngine()
+    return _engine
+
+
+async def _run_ytdlp_cli(url_clip: str, destination_file: str, rate_limit: int) -> str:
+    """Télécharge un clip avec un processus yt-dlp. Retourne le fichier écrit ou lève une exception."""
+    command = ["yt-dlp", "--no-playlist", "--geo-bypass", "--no-warnings"]
+    if rate_limit > 0:
+        command += ["--limit-rate", str(rate_limit)]
+    command += ["-o", destination_file, url_clip]
+
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(
+            stderr.decode(errors="replace").strip() or f"code {process.returncode}"
+        )
+    path = find_downloaded_file(destination_file)
+    if not path:
+        raise RuntimeError("Téléchargement terminé mais le fichier n'a pas été trouvé")
+    return path
+
+
+async def download_clip_async(
+    url_clip: str,
+    destination_file: str,
+    rate_limit: int = 0,
+    retries: int = DOWNLOAD_RETRIES,
+    backoff: float = DOWNLOAD_BACKOFF_SECONDS,
+    engine: Optional[DownloadEngine] = None,
+    bandwidth: Optional[TokenBucket] = None,
+    verify: Optional[Callable[[str], Any]] = None,
+) -> DownloadResult:
+    """
+    Télécharge un clip sans bloquer la boucle asyncio.
+
+    Utilise le moteur en processus (thread de travail) si yt_dlp est importable,
+    sinon un sous-processus yt-dlp.
+
+    Args:
+        url_clip: L'URL du clip Twitch à télécharger
+        destination_file: Le chemin complet du fichier de destination
+        rate_limit: Débit maximum du sous-processus yt-dlp en octets/s (0: illimité)
+        retries: Nombre maximum de tentatives
+        backoff: Délai avant la deuxième tentative, doublé ensuite
+        engine: Moteur de téléchargement (celui du processus par défaut)
+        bandwidth: Seau de jetons en octets partagé par les téléchargements du moteur
+        verify: Vérification appelée (dans un thread) avec le fichier téléchargé ; elle lève
+            une exception si le fichier est invalide, qui est alors supprimé et téléchargé de nouveau
+
+    Returns:
+        DownloadResult avec la taille téléchargée, la durée totale et le résultat de la vérification
+    """
+    parent_dir = os.path.dirname(destination_file)
+    if parent_dir:
+        os.makedirs(parent_dir, exist_ok=True)
+    if engine is None:
+        engine = get_download_engine()
+
+    started = time.monotonic()
+    error = ""
+    for attempt in range(1, retries + 1):
+        try:
+            if engine.available:
+                await asyncio.to_thread(
+                    engine.download, url_clip, destination_file, bandwidth
+                )
+                path = destination_file
+            else:
+                path = await _run_ytdlp_cli(url_clip, destination_file, rate_limit)
+            info = None
+            if verify:
+                try:
+                    info = await asyncio.to_thread(verify, path)
+                except Exception:
+                    # Fichier complet mais invalide : la reprise n'aurait pas de sens
+                    os.remove(path)
+                    raise
+            return DownloadResult(
+                url=url_clip,
+                path=path,
+                success=True,
+                bytes=os.path.getsize(path),
+                seconds=time.monotonic() - started,
+                attempts=attempt,
+                info=info,
+            )
+        except FileNotFoundError as e:
+            if not engine.available:
+                # Inutile de réessayer : yt-dlp n'est pas installé
+                error = "yt-dlp n'est pas installé ou n'est pas dans le PATH (pip install yt-dlp)"
+                break
+            error = str(e)
+        except Exception as e:
+            error = str(e)
+
+        if attempt < retries:
+            delay = backoff * 2 ** (attempt - 1)
+            print(
+                f"Échec du téléchargement de {url_clip} (tentative {attempt}/{retries}), nouvel essai dans {delay:.0f}s: {error}"
+            )
+            await asyncio.sleep(delay)
+
+    return DownloadResult(
+        url=url_clip,
+        path=destination_file,
+        success=False,
+        seconds=time.monotonic() - started,
+        attempts=attempt,
+        error=error,
+    )
+
+
+async def download_clips(
+    jobs: list[tuple[str, str]],
+    concurrency: int = DOWNLOAD_CONCURRENCY,
+    max_bandwidth: int = MAX_DOWNLOAD_BANDWIDTH,
+    retries: int = DOWNLOAD_RETRIES,
+    engine: Optional[DownloadEngine] = None,
+    verify: Optional[Callable[[str, str], Any]] = None,
+    on_complete: Optional[Callable[[int, DownloadResult], Awaitable[None]]] = None,
+) -> list[DownloadResult]:
+    """
+    Télécharge plusieurs clips en parallèle.
+
+    Avec le moteur en processus, la bande passante totale est plafonnée par un
+    seau de jetons partagé ; avec la ligne de commande, elle est répartie
+    entre les téléchargements simultanés.
+
+    Args:
+        jobs: Couples (URL du clip, fichier de destination)
+        concurrency: Nombre de téléchargements simultanés
+        max_bandwidth: Bande passante totale en octets/s (0: illimitée)
+        retries: Nombre maximum de tentatives par clip
+        engine: Moteur de téléchargement (celui du processus par défaut)
+        verify: Vérification appelée avec (URL du clip, fichier) après chaque téléchargement
+        on_complete: Coroutine appelée avec (index du job, résultat) dès qu'un téléchargement se termine
+
+    Returns:
+        Un DownloadResult par clip, dans le même ordre que `jobs`
+    """
+    concurrency = max(1, concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    if engine is None:
+        engine = get_download_engine()
+    per_download_rate = max_bandwidth // concurrency if max_bandwidth > 0 else 0
+    bandwidth = (
+        TokenBucket(rate=max_bandwidth, capacity=max_bandwidth)
+        if max_bandwidth > 0
+        else None
+    )
+
+    async def download_one(index: int, url_clip: str, destination_file: str):
+        async with semaphore:
+            print(f"Téléchargement du clip {index + 1}/{len(jobs)}: {url_clip}")
+            result = await download_clip_async(
+                url_clip,
+                destination_file,
+                rate_limit=per_download_rate,
+                retries=retries,
+                engine=engine,
+                bandwidth=bandwidth,
+                verify=(lambda path: verify(url_clip, path)) if verify else None,
+            )
+        if result.success:
+            speed = result.bytes / result.seconds / 1024 if result.seconds > 0 else 0
+            print(
+                f"Clip téléchargé: {result.path} ({result.bytes / (1024 * 1024):.1f} Mo en {result.seconds:.1f}s, {speed:.0f} Ko/s)"
+            )
+        else:
+            print(f"Échec du téléchargement pour {url_clip}: {result.error}")
+        if on_complete:
+            await on_complete(index, result)
+        return result
+
+    started = time.monotonic()
+    results = await asyncio.gather(
+        *(download_one(i, url, destination) for i, (url, destination) in enumerate(jobs))
+    )
+    total_bytes = sum(result.bytes for result in results)
+    print(
+        f"{sum(result.success for result in results)}/{len(jobs)} clips téléchargés "
+        f"({total_bytes / (1024 * 1024):.1f} Mo en {time.monotonic() - started:.1f}s)"
+    )
+    return list(results)
@@ -0,0 +1,263 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from twitchAPI.twitch import Twitch
+from src.twitchClips import (
+    Clip,
+    get_clips_with_term,
+    resolve_broadcaster_ids,
+    refresh_clip_view_counts,
+)
+from src.clip_catalog import ClipCatalog
+from src.clip_selection import TopKClips
+from src.title_matcher import get_title_matcher
+from src.rate_limiter import TokenBucket, create_helix_rate_limiter
+
+# Nombre de streamers traités en parallèle
+HARVEST_CONCURRENCY = 8
+# Fenêtre de clips conservée dans le catalogue (en jours)
+CATALOG_WINDOW_DAYS = 7
+# Recouvrement entre deux passes : Twitch peut indexer un clip avec un peu de retard
+WATERMARK_OVERLAP = timedelta(hours=1)
+# À partir de ce nombre de streamers suivis, un seul balayage des clips du jeu
+# coûte moins de requêtes qu'une pagination par streamer
+GAME_SWEEP_MIN_STREAMERS = 50
+# Nombre maximum de clips parcourus lors d'un balayage du jeu
+GAME_SWEEP_MAX_CLIPS = 20000
+# Nombre maximum de clips récoltés par streamer et par passe
+HARVEST_MAX_CLIPS = 500
+
+
+def choose_harvest_strategy(tracked_count: int, game_id: Optional[str]) -> str:
+    """Retourne "game_sweep" ou "per_broadcaster" selon la taille de l'ensemble suivi."""
+    if game_id and tracked_count >= GAME_SWEEP_MIN_STREAMERS:
+        return "game_sweep"
+    return "per_broadcaster"
+
+
+async def harvest_game_sweep(
+    twitch: Twitch,
+    game_id: str,
+    broadcaster_ids: set[str],
+    top_k: TopKClips,
+    terms: Optional[list[str]] = None,
+    started_at: Optional[datetime] = None,
+    ended_at: Optional[datetime] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+    max_clips: int = GAME_SWEEP_MAX_CLIPS,
+) -> tuple[list[Clip], bool]:
+    """
+    Parcourt en une seule pagination les clips d'un jeu et garde ceux des streamers suivis.
+
+    Un clip est retenu si son streamer fait partie de `broadcaster_ids` ou si son
+    titre contient l'un des `terms`. Helix renvoie les clips par nombre de vues
+    décroissant : le balayage s'arrête dès qu'un clip ne peut plus entrer dans `top_k`.
+    Les erreurs de l'API sont propagées.
+
+    Args:
+        twitch: Instance Twitch authentifiée
+        game_id: ID du jeu à balayer
+        broadcaster_ids: IDs des streamers suivis
+        top_k: Sélection en cours, alimentée par les clips retenus
+        terms: Termes recherchés dans le titre des clips (optionnel)
+        started_at: Début de la période (par défaut il y a 7 jours)
+        ended_at: Fin de la période (par défaut maintenant)
+        rate_limiter: Limiteur partagé consulté avant chaque page (optionnel)
+        max_clips: Nombre maximum de clips parcourus
+
+    Returns:
+        (clips retenus, True si tous les clips de la période ont été parcourus,
+        False si le balayage s'est arrêté au seuil de sélection ou à `max_clips`)
+    """
+    matcher = get_title_matcher(terms or [])
+    matched = []
+    scanned = 0
+    complete = True
+    print(f"Balayage des clips du jeu {game_id} pour {len(broadcaster_ids)} streamers suivis")
+
+    clip_stream = get_clips_with_term(
+        twitch,
+        game_id=game_id,
+        first_count=100,
+        max_clips=max_clips,
+        rate_limiter=rate_limiter,
+        started_at=started_at,
+        ended_at=ended_at,
+        raise_errors=True,
+    )
+    try:
+        async for clip in clip_stream:
+            scanned += 1
+            if top_k.is_full and clip.view_count <= top_k.threshold:
+                print(
+                    f"Arrêt du balayage: {clip.view_count} vues, sous le seuil de sélection ({top_k.threshold})"
+                )
+                # Les clips suivants, encore sous le seuil, peuvent le dépasser plus tard
+                complete = False
+                break
+            if clip.broadcaster_id in broadcaster_ids or matcher.matches(clip.title):
+                matched.append(clip)
+                top_k.push(clip)
+        else:
+            complete = scanned < max_clips
+    finally:
+        await clip_stream.aclose()
+
+    print(f"Balayage terminé: {len(matched)} clips retenus")
+    return matched, complete
+
+
+def _sweep_watermark_key(game_id: str) -> str:
+    """Clé du watermark du balayage d'un jeu, distincte des IDs de streamers."""
+    return f"game:{game_id}"
+
+
+async def harvest_incremental(
+    twitch: Twitch,
+    streamers: list[str],
+    catalog: ClipCatalog,
+    max_clips_per_streamer: int = 30,
+    concurrency: int = HARVEST_CONCURRENCY,
+    rate_limiter: Optional[TokenBucket] = None,
+    window_days: int = CATALOG_WINDOW_DAYS,
+    game_id: Optional[str] = None,
+    terms: Optional[list[str]] = None,
+    top_k_size: int = 20,
+) -> int:
+    """
+    Récolte uniquement les clips créés depuis la dernière passe et les ajoute au catalogue.
+
+    Chaque streamer a son propre watermark : la passe demande l'intervalle
+    [watermark - recouvrement, maintenant] au lieu des 7 derniers jours. Les
+    vues des clips déjà catalogués dans la fenêtre sont ensuite rafraîchies.
+
+    Si `game_id` est fourni et que l'ensemble suivi est grand, les paginations
+    par streamer sont remplacées par un balayage unique des clips du jeu, arrêté
+    dès que les clips passent sous le seuil des `top_k_size` meilleurs clips.
+
+    Args:
+        twitch: Instance Twitch authentifiée
+        streamers: Noms des streamers suivis
+        catalog: Catalogue local à mettre à jour (non enregistré par cette fonction)
+        max_clips_per_streamer: Nombre de clips par page pour chaque streamer
+        concurrency: Nombre maximum de streamers traités en même temps
+        rate_limiter: Limiteur partagé (créé sur le budget Helix si absent)
+        window_days: Profondeur de la fenêtre conservée dans le catalogue
+        game_id: ID du jeu, active le balayage du jeu pour les grands ensembles
+        terms: Termes recherchés dans le titre lors d'un balayage du jeu
+        top_k_size: Taille de la sélection utilisée pour arrêter le balayage
+
+    Returns:
+        Nombre de nouveaux clips ajoutés au catalogue
+    """
+    if rate_limiter is None:
+        rate_limiter = create_helix_rate_limiter()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    now = datetime.now(timezone.utc)
+    window_start = now - timedelta(days=window_days)
+
+    broadcaster_ids = await resolve_broadcaster_ids(
+        twitch, streamers, rate_limiter=rate_limiter
+    )
+
+    async def harvest_one(streamer: str) -> list[Clip]:
+        broadcaster_id = broadcaster_ids.get(streamer)
+        if not broadcaster_id:
+            return []
+        watermark = catalog.get_watermark(broadcaster_id)
+        started_at = window_start
+        if watermark:
+            started_at = max(window_start, watermark - WATERMARK_OVERLAP)
+        async with semaphore:
+            try:
+                streamer_clips = [
+                    clip
+                    async for clip in get_clips_with_term(
+                        twitch,
+                        broadcaster_id=broadcaster_id,
+                        term="",
+                        first_count=max_clips_per_streamer,
+                        max_clips=HARVEST_MAX_CLIPS,
+                        rate_limiter=rate_limiter,
+                        started_at=started_at,
+                        ended_at=now,
+                        raise_errors=True,
+                    )
+                ]
+            except Exception as e:
+                # Watermark inchangé : la période sera redemandée à la prochaine passe
+                print(f"Erreur lors de la récolte des clips pour {streamer}: {e}")
+                return []
+        if len(streamer_clips) >= HARVEST_MAX_CLIPS:
+            # Pagination tronquée (clips triés par vues, pas par date) : des clips
+            # de la période manquent, le watermark n'avance pas
+            print(
+                f"Récolte de {streamer} tronquée à {HARVEST_MAX_CLIPS} clips, watermark inchangé"
+            )
+        else:
+            catalog.set_watermark(broadcaster_id, now)
+        return streamer_clips
+
+    # Rafraîchir d'abord les vues des clips déjà connus, puis ajouter les nouveaux
+    known_ids = catalog.clip_ids_since(window_start)
+    if known_ids:
+        print(f"Rafraîchissement des vues de {len(known_ids)} clips catalogués...")
+        view_counts = await refresh_clip_view_counts(
+            twitch, known_ids, rate_limiter=rate_limiter
+        )
+        for clip_id, view_count in view_counts.items():
+            if view_count < 0:
+                catalog.remove(clip_id)
+            else:
+                catalog.update_view_count(clip_id, view_count)
+
+    strategy = choose_harvest_strategy(len(streamers), game_id)
+    print(f"Stratégie de récolte: {strategy} ({len(streamers)} streamers suivis)")
+    if strategy == "game_sweep":
+        # Seuil d'entrée initial : les meilleurs clips déjà catalogués de la semaine
+        top_k = TopKClips(top_k_size)
+        top_k.extend(catalog.iter_clips_since(window_start))
+        tracked_ids = {broadcaster_id for broadcaster_id in broadcaster_ids.values() if broadcaster_id}
+        # Le balayage a son propre watermark : il ne catalogue que les clips qui
+        # entrent dans la sélection, les watermarks par streamer restent inchangés.
+        # Il n'avance qu'après un parcours complet : un arrêt au seuil laisse des clips
+        # peu vus pour l'instant, la fenêtre est alors rebalayée à la passe suivante
+        sweep_key = _sweep_watermark_key(game_id)
+        sweep_watermark = catalog.get_watermark(sweep_key)
+        started_at = window_start
+        if sweep_watermark:
+            started_at = max(window_start, sweep_watermark - WATERMARK_OVERLAP)
+        try:
+            swept_clips, complete = await harvest_game_sweep(
+                twitch,
+                game_id,
+                tracked_ids,
+                top_k,
+                terms=terms,
+                started_at=started_at,
+                ended_at=now,
+                rate_limiter=rate_limiter,
+            )
+        except Exception as e:
+            print(f"Erreur lors du balayage du jeu {game_id}, watermark inchangé: {e}")
+            swept_clips, complete = [], False
+        if complete:
+            catalog.set_watermark(sweep_key, now)
+        harvested = [swept_clips]
+    else:
+        harvested = await asyncio.gather(
+            *(harvest_one(streamer) for streamer in streamers)
+        )
+
+    new_clips = 0
+    for streamer_clips in harvested:
+        for clip in streamer_clips:
+            if clip.id not in catalog.clips:
+                new_clips += 1
+            catalog.upsert(clip)
+
+    pruned = catalog.prune(window_start)
+    print(
+        f"Catalogue mis à jour: {new_clips} nouveaux clips, {pruned} clips expirés, {len(catalog.clips)} au total"
+    )
+    return new_clips
@@ -0,0 +1,72 @@
+import asyncio
+import math
+import time
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from src.clip_cache import ClipCache, EVICTION_GRACE_SECONDS
+from src.clip_catalog import ClipCatalog
+from src.clip_selection import TopKClips
+
+# Nombre de candidats préchargés par rapport au nombre de clips du best-of :
+# la marge absorbe les changements de classement d'ici la génération
+PREFETCH_MARGIN = 1.5
+
+
+async def prefetch_bestof_clips(
+    total_bestof_clips: int = 20,
+    since: Optional[datetime] = None,
+    margin: float = PREFETCH_MARGIN,
+    cache: Optional[ClipCache] = None,
+    catalog: Optional[ClipCatalog] = None,
+    catalog_lock: Optional[asyncio.Lock] = None,
+) -> int:
+    """
+    Télécharge à l'avance dans le cache les clips les plus susceptibles d'entrer dans le best-of.
+
+    Les meilleurs clips du catalogue (par nombre de vues) sont téléchargés s'ils
+    ne sont pas déjà en cache. Les clips préchargés lors d'un passage précédent
+    qui ne font plus partie des candidats sont supprimés du cache.
+
+    Args:
+        total_bestof_clips: Nombre de clips du best-of
+        since: Début de la fenêtre du prochain best-of (7 derniers jours par défaut)
+        margin: Facteur appliqué à `total_bestof_clips` pour le nombre de candidats
+        cache: Cache de clips (celui par défaut si absent)
+        catalog: Catalogue de clips (relu depuis le disque si absent)
+        catalog_lock: Verrou du catalogue, tenu seulement pendant sa lecture (pas
+            pendant les téléchargements)
+
+    Returns:
+        Nombre de clips candidats présents dans le cache après le passage
+    """
+    if since is None:
+        since = datetime.now(timezone.utc) - timedelta(days=7)
+    cache = cache or ClipCache()
+
+    async with catalog_lock or nullcontext():
+        catalog = catalog or ClipCatalog()
+        candidates = TopKClips(math.ceil(total_bestof_clips * margin))
+        candidates.extend(catalog.iter_clips_since(since))
+        candidate_clips = candidates.results()
+    candidate_ids = {clip.id for clip in candidate_clips}
+
+    # Oublier les clips préchargés sortis de la course (sauf s'ils viennent d'être utilisés)
+    dropped = 0
+    now = time.time()
+    entries = await asyncio.to_thread(cache.entries)
+    for clip_id, entry in entries.items():
+        if (
+            entry.get("prefetched")
+            and clip_id not in candidate_ids
+            and now - entry.get("last_access", 0) >= EVICTION_GRACE_SECONDS
+        ):
+            await asyncio.to_thread(cache.discard, clip_id)
+            dropped += 1
+
+    cached_paths = await cache.ensure(candidate_clips, prefetched=True)
+    print(
+        f"Préchargement: {len(cached_paths)}/{len(candidate_clips)} candidats en cache, "
+        f"{dropped} clips sortis du classement supprimés"
+    )
+    return len(cached_paths)
@@ -0,0 +1,64 @@
+import heapq
+from typing import AsyncIterator, Iterable
+from src.twitchClips import Clip
+
+
+class TopKClips:
+    """
+    Garde les K clips les plus vus parmi un flux de clips, en mémoire O(K).
+
+    Utilise un tas-min de taille K : un nouveau clip ne remplace le moins vu
+    des clips retenus que s'il a strictement plus de vues. À vues égales, le
+    premier clip reçu est gardé, comme avec un tri stable. Un clip déjà retenu
+    (même ID) n'est pas ajouté une seconde fois.
+    """
+
+    def __init__(self, k: int):
+        self.k = k
+        self.seen = 0
+        self._heap: list[tuple[int, int, Clip]] = []
+        self._ids: set[str] = set()
+
+    def push(self, clip: Clip) -> bool:
+        """Propose un clip et retourne True s'il fait partie des K meilleurs pour l'instant."""
+        if clip.id in self._ids:
+            return False
+        # -seq : parmi des clips à égalité, le plus récemment reçu est évincé en premier
+        entry = (clip.view_count, -self.seen, clip)
+        self.seen += 1
+        if self.k <= 0:
+            return False
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            self._ids.add(clip.id)
+            return True
+        if entry[:2] > self._heap[0][:2]:
+            evicted = heapq.heapreplace(self._heap, entry)
+            self._ids.discard(evicted[2].id)
+            self._ids.add(clip.id)
+            return True
+        return False
+
+    def extend(self, clips: Iterable[Clip]):
+        for clip in clips:
+            self.push(clip)
+
+    async def consume(self, clips: AsyncIterator[Clip]):
+        """Consomme un flux asynchrone de clips."""
+        async for clip in clips:
+            self.push(clip)
+
+    @property
+    def is_full(self) -> bool:
+        return len(self._heap) >= self.k
+
+    @property
+    def threshold(self) -> int:
+        """Nombre de vues à dépasser pour entrer dans la sélection (-1 tant qu'elle n'est pas pleine)."""
+        if not self.is_full:
+            return -1
+        return self._heap[0][0]
+
+    def results(self) -> list[Clip]:
+        """Retourne les clips retenus, du plus vu au moins vu."""
+        return [clip for _, _, clip in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
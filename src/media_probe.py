@@ -0,0 +1,351 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import FFmpegInfosParser
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+# ffprobe est utilisé s'il est installé, sinon on retombe sur l'analyse de MoviePy (ffmpeg -i)
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY") or shutil.which("ffprobe")
+# Écart toléré entre la durée annoncée par Twitch et la durée du fichier
+DURATION_TOLERANCE_SECONDS = 1.0
+DURATION_TOLERANCE_RATIO = 0.05
+# Résultats d'analyse déjà obtenus, par fichier (revalidés par taille et date de modification)
+PROBE_CACHE_PATH = "data/probe_cache.json"
+
+# Nombre de canaux des dispositions audio affichées par ffmpeg
+_CHANNEL_LAYOUTS = {"mono": 1, "stereo": 2, "2.1": 3, "quad": 4, "5.0": 5, "5.1": 6, "7.1": 8}
+_VIDEO_STREAM_RE = re.compile(r"Stream #.*?: Video: (\w+)[^,]*, (\w+)")
+_AUDIO_STREAM_RE = re.compile(r"Stream #.*?: Audio: (\w+)[^,]*, (\d+) Hz, ([^,]+)")
+_VIDEO_PROFILE_RE = re.compile(r"Stream #.*?: Video: \w+ \(([^)/]+)\)")
+_VIDEO_TIMESCALE_RE = re.compile(r"Stream #.*?: Video: .*?([\d.]+)(k?) tbn")
+_H264_LEVEL_RE = re.compile(r"level_idc\s+\d+ = (\d+)")
+
+
+@dataclass
+class MediaInfo:
+    """Caractéristiques d'un fichier vidéo, lues par ffprobe ou ffmpeg."""
+
+    duration: float
+    width: int
+    height: int
+    fps: float
+    video_codec: str
+    has_audio: bool
+    audio_codec: str = ""
+    audio_sample_rate: int = 0
+    format_name: str = ""
+    pixel_format: str = ""
+    audio_channels: int = 0
+    # Profil ("High") et niveau (42 pour 4.2) H.264, échelle de temps de la piste vidéo (90000 pour 1/90000)
+    video_profile: str = ""
+    video_level: int = 0
+    video_timescale: int = 0
+
+
+def media_info_from_dict(data: dict) -> Optional[MediaInfo]:
+    """
+    Reconstruit une analyse enregistrée. Retourne None si elle date d'une version
+    de MediaInfo aux champs différents : le fichier doit alors être relu.
+    """
+    if set(data) != {field.name for field in fields(MediaInfo)}:
+        return None
+    return MediaInfo(**data)
+
+
+def _parse_rate(rate: str) -> float:
+    """Convertit une fréquence ffprobe ("60000/1001") en nombre d'images par seconde."""
+    try:
+        numerator, _, denominator = rate.partition("/")
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def _parse_timescale(time_base: str) -> int:
+    """Échelle de temps d'une base de temps ffprobe ("1/90000" -> 90000)."""
+    numerator, _, denominator = time_base.partition("/")
+    if numerator != "1" or not denominator.isdigit():
+        return 0
+    return int(denominator)
+
+
+def _read_h264_level(path: str) -> int:
+    """Lit le niveau H.264 (level_idc) dans le SPS de la première image, sans décoder la vidéo."""
+    result = subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-v", "trace",
+            "-i", path,
+            "-map", "0:v:0",
+            "-c", "copy",
+            "-bsf:v", "trace_headers",
+            "-frames:v", "1",
+            "-f", "null", "-",
+        ],
+        capture_output=True,
+        text=True,
+        errors="replace",
+        timeout=60,
+    )
+    match = _H264_LEVEL_RE.search(result.stderr)
+    return int(match.group(1)) if match else 0
+
+
+def _probe_with_ffprobe(path: str) -> MediaInfo:
+    result = subprocess.run(
+        [
+            FFPROBE_BINARY,
+            "-v", "error",
+            "-print_format", "json",
+            "-show_format",
+            "-show_streams",
+            path,
+        ],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    if result.returncode != 0:
+        raise ValueError(result.stderr.strip() or f"ffprobe: code {result.returncode}")
+    data = json.loads(result.stdout)
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    if video is None:
+        raise ValueError("aucun flux vidéo")
+    return MediaInfo(
+        duration=float(data.get("format", {}).get("duration") or video.get("duration") or 0),
+        width=int(video.get("width", 0)),
+        height=int(video.get("height", 0)),
+        fps=_parse_rate(video.get("avg_frame_rate") or video.get("r_frame_rate") or "0"),
+        video_codec=video.get("codec_name", ""),
+        has_audio=audio is not None,
+        audio_codec=audio.get("codec_name", "") if audio else "",
+        audio_sample_rate=int(audio.get("sample_rate", 0)) if audio else 0,
+        format_name=data.get("format", {}).get("format_name", ""),
+        pixel_format=video.get("pix_fmt", ""),
+        audio_channels=int(audio.get("channels", 0)) if audio else 0,
+        video_profile=video.get("profile", ""),
+        video_level=int(video.get("level", 0) or 0),
+        video_timescale=_parse_timescale(video.get("time_base", "")),
+    )
+
+
+def _probe_with_ffmpeg(path: str) -> MediaInfo:
+    """Analyse la sortie de `ffmpeg -i` (MoviePy pour la durée et la vidéo, le reste ici)."""
+    result = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", path],
+        capture_output=True,
+        text=True,
+        errors="replace",
+        timeout=60,
+    )
+    try:
+        infos = FFmpegInfosParser(result.stderr, path).parse()
+    except Exception as e:
+        raise ValueError(result.stderr.strip()[-300:] or str(e)) from e
+    if not infos.get("video_found"):
+        raise ValueError("aucun flux vidéo")
+    width, height = infos.get("video_size") or (0, 0)
+    video = _VIDEO_STREAM_RE.search(result.stderr)
+    audio = _AUDIO_STREAM_RE.search(result.stderr)
+    audio_layout = audio.group(3).split("(")[0].strip() if audio else ""
+    video_codec = infos.get("video_codec_name") or (video.group(1) if video else "")
+    profile = _VIDEO_PROFILE_RE.search(result.stderr)
+    timescale = _VIDEO_TIMESCALE_RE.search(result.stderr)
+    return MediaInfo(
+        duration=float(infos.get("duration") or 0),
+        width=int(width),
+        height=int(height),
+        fps=float(infos.get("video_fps") or 0),
+        video_codec=video_codec,
+        has_audio=bool(infos.get("audio_found")),
+        audio_codec=audio.group(1) if audio else "",
+        audio_sample_rate=int(infos.get("audio_fps") or 0),
+        pixel_format=video.group(2) if video else "",
+        audio_channels=_count_channels(audio_layout),
+        video_profile=profile.group(1).strip() if profile else "",
+        # ffmpeg -i n'affiche pas le niveau : il est lu dans les en-têtes du flux
+        video_level=_read_h264_level(path) if video_codec == "h264" else 0,
+        video_timescale=(
+            int(float(timescale.group(1)) * (1000 if timescale.group(2) else 1)) if timescale else 0
+        ),
+    )
+
+
+def _count_channels(layout: str) -> int:
+    """Nombre de canaux d'une disposition ffmpeg ("stereo", "5.1", "6 channels")."""
+    if layout in _CHANNEL_LAYOUTS:
+        return _CHANNEL_LAYOUTS[layout]
+    count = layout.split()[0] if layout else ""
+    return int(count) if count.isdigit() else 0
+
+
+def probe_media(path: str) -> MediaInfo:
+    """
+    Lit le conteneur et les flux d'un fichier vidéo.
+
+    Args:
+        path: Chemin du fichier
+
+    Returns:
+        MediaInfo du fichier. Lève ValueError si le fichier est illisible ou sans vidéo.
+    """
+    if not os.path.exists(path):
+        raise ValueError(f"fichier introuvable: {path}")
+    if FFPROBE_BINARY:
+        return _probe_with_ffprobe(path)
+    return _probe_with_ffmpeg(path)
+
+
+class ProbeCache:
+    """
+    Cache des analyses de fichiers vidéo, partagé entre les processus.
+
+    Une entrée est indexée par le chemin absolu du fichier et reste valable
+    tant que sa taille et sa date de modification n'ont pas changé : un même
+    fichier n'est analysé qu'une fois, d'une exécution à l'autre.
+    """
+
+    def __init__(self, cache_path: str = PROBE_CACHE_PATH):
+        self.cache_path = cache_path
+        self.lock_path = f"{cache_path}.lock"
+        self.entries: dict = self._read()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Erreur lors de la lecture du cache d'analyse: {e}")
+            return {}
+
+    @contextmanager
+    def _locked_entries(self):
+        """Verrouille le cache et fournit les entrées sur disque, réécrites de façon atomique à la sortie."""
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        with open(self.lock_path, "a+") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entries = self._read()
+                yield entries
+                tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.cache_path)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _lookup(self, key: str, stat: os.stat_result) -> Optional[MediaInfo]:
+        entry = self.entries.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            return media_info_from_dict(entry["info"])
+        return None
+
+    def remember(self, path: str, info: MediaInfo):
+        """Enregistre l'analyse d'un fichier obtenue ailleurs (vérification, rendu)."""
+        stat = os.stat(path)
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime, "info": asdict(info)}
+        key = os.path.abspath(path)
+        with self._locked_entries() as entries:
+            # Les fichiers supprimés depuis (segments intermédiaires) sont oubliés
+            for known_path in [known for known in entries if not os.path.exists(known)]:
+                del entries[known_path]
+            entries[key] = entry
+            self.entries = entries
+
+    def probe(self, path: str) -> MediaInfo:
+        """
+        Retourne l'analyse d'un fichier, en ne lisant le fichier que s'il est inconnu ou modifié.
+
+        Returns:
+            MediaInfo du fichier. Lève ValueError si le fichier est illisible ou sans vidéo.
+        """
+        if not os.path.exists(path):
+            raise ValueError(f"fichier introuvable: {path}")
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        info = self._lookup(key, stat)
+        if info is None:
+            # Un autre processus a peut-être déjà analysé ce fichier
+            self.entries = self._read()
+            info = self._lookup(key, stat)
+        if info is None:
+            info = probe_media(path)
+            self.remember(path, info)
+        return info
+
+
+_probe_cache: Optional[ProbeCache] = None
+
+
+def get_probe_cache() -> ProbeCache:
+    """Retourne le cache d'analyse partagé par le processus courant."""
+    global _probe_cache
+    if _probe_cache is None:
+        _probe_cache = ProbeCache()
+    return _probe_cache
+
+
+def check_tail_decodes(path: str, seconds: float = 1.0):
+    """
+    Décode la dernière seconde de vidéo du fichier. Un fichier tronqué dont
+    l'index annonce la durée complète ne produit ici aucune image. Lève ValueError sinon.
+    """
+    result = subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-v", "error",
+            "-sseof", f"-{seconds}",
+            "-i", path,
+            "-map", "0:v:0",
+            "-f", "framecrc",
+            "-",
+        ],
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    frames = [line for line in result.stdout.splitlines() if line and not line.startswith("#")]
+    if result.returncode != 0 or not frames:
+        raise ValueError(
+            f"fin du fichier illisible: {result.stderr.strip()[:200] or 'aucune image décodée'}"
+        )
+
+
+def verify_clip_file(path: str, expected_duration: Optional[float] = None) -> MediaInfo:
+    """
+    Vérifie qu'un clip téléchargé est complet et décodable.
+
+    Args:
+        path: Fichier téléchargé
+        expected_duration: Durée annoncée par Twitch (Clip.duration), en secondes
+
+    Returns:
+        MediaInfo du fichier. Lève ValueError si le fichier est invalide.
+    """
+    info = probe_media(path)
+    if expected_duration:
+        tolerance = max(DURATION_TOLERANCE_SECONDS, expected_duration * DURATION_TOLERANCE_RATIO)
+        if abs(info.duration - expected_duration) > tolerance:
+            raise ValueError(
+                f"durée {info.duration:.1f}s au lieu de {expected_duration:.1f}s"
+            )
+    check_tail_decodes(path)
+    return info
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import threading
+import time
+
+# Budget de l'API Helix pour un token d'application : 800 points par minute.
+# On garde une marge pour les requêtes faites en dehors du limiteur.
+HELIX_POINTS_PER_MINUTE = int(os.getenv("HELIX_POINTS_PER_MINUTE", "700"))
+# Nombre de requêtes pouvant partir d'un coup avant que le débit ne soit lissé
+HELIX_BURST = int(os.getenv("HELIX_BURST", "40"))
+
+
+class TokenBucket:
+    """
+    Limiteur de débit à seau de jetons.
+
+    Le seau se remplit de `rate` jetons par seconde jusqu'à `capacity`.
+    Chaque appel à `acquire` consomme des jetons et attend s'il n'y en a pas assez.
+    Une même instance peut être partagée entre toutes les coroutines d'un programme.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate et capacity doivent être strictement positifs")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Consomme les jetons si possible, sinon retourne le temps d'attente nécessaire."""
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    async def acquire(self, tokens: float = 1):
+        """Attend (sans bloquer la boucle asyncio) que `tokens` jetons soient disponibles."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, tokens: float = 1):
+        """Version bloquante d'`acquire`, pour les threads de travail."""
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+def create_helix_rate_limiter(points_per_minute: int = HELIX_POINTS_PER_MINUTE) -> TokenBucket:
+    """Crée un limiteur dimensionné sur le budget de requêtes Helix de l'application."""
+    return TokenBucket(rate=points_per_minute / 60, capacity=min(HELIX_BURST, points_per_minute))
@@ -0,0 +1,378 @@
+import asyncio
+import errno
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from moviepy.config import FFMPEG_BINARY
+from src.clip_cache import ClipCache
+from src.media_probe import get_probe_cache
+from src.twitchClips import Clip
+from src.videoAssembler import (
+    INTRO_PATH,
+    OUTPUT_TARGETS,
+    OUTRO_PATH,
+    RENDER_WORKERS,
+    OutputTarget,
+    concat_segments,
+    interleave_transitions,
+    record_render_stats,
+    render_asset_targets,
+    render_segment_targets,
+    select_output_profile,
+    select_segment_paths,
+    streamer_tag,
+    target_output_path,
+    target_profile,
+    worker_profile,
+)
+
+# Nombre de clips téléchargés en attente de normalisation
+PIPELINE_QUEUE_SIZE = 4
+# Nombre de segments normalisés en même temps (un processus chacun)
+NORMALIZE_WORKERS = RENDER_WORKERS
+
+
+def _feed_fifo(fifo_path: str, segment_path: str, reader: asyncio.subprocess.Process):
+    """Copie un segment dans le tube nommé lu par ffmpeg (bloquant, exécuté dans un thread)."""
+    # Ouverture non bloquante répétée : on n'attend pas indéfiniment un ffmpeg qui aurait échoué
+    while True:
+        try:
+            fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+            break
+        except OSError as e:
+            if e.errno != errno.ENXIO or reader.returncode is not None:
+                raise
+            time.sleep(0.05)
+    os.set_blocking(fd, True)
+    with os.fdopen(fd, "wb") as fifo, open(segment_path, "rb") as segment:
+        shutil.copyfileobj(segment, fifo, 1024 * 1024)
+
+
+async def _wait_segment(future: asyncio.Future, stages: Optional[asyncio.Task]):
+    """Attend un segment, en relançant l'erreur des étapes de rendu si elles échouent avant."""
+    if stages is not None and not future.done():
+        await asyncio.wait([future, stages], return_when=asyncio.FIRST_COMPLETED)
+        if stages.done() and not stages.cancelled() and stages.exception() is not None:
+            raise stages.exception()
+    return await future
+
+
+async def _stream_concat(
+    segment_futures: list[asyncio.Future],
+    output_path: str,
+    work_dir: str,
+    target: int = 0,
+    stages: Optional[asyncio.Task] = None,
+) -> bool:
+    """
+    Assemble les segments au fil de l'eau : ffmpeg lit la liste de segments
+    sous forme de tubes nommés, alimentés dans l'ordre dès que chaque segment
+    est prêt. Retourne False si un segment manque (l'assemblage est alors abandonné).
+
+    Chaque futur donne les segments de toutes les sorties : seuls ceux de la
+    sortie d'indice `target` sont assemblés ici. Si la tâche `stages` (téléchargement
+    et rendu) échoue, son erreur est relancée au lieu d'attendre les segments.
+    """
+    fifo_paths = []
+    for i in range(len(segment_futures)):
+        fifo_path = os.path.join(work_dir, f"fifo_{target}_{i:03d}.mp4")
+        os.mkfifo(fifo_path)
+        fifo_paths.append(fifo_path)
+    list_path = os.path.join(work_dir, f"segments_{target}.txt")
+    with open(list_path, "w") as f:
+        for fifo_path in fifo_paths:
+            f.write(f"file '{os.path.abspath(fifo_path)}'\n")
+
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_BINARY,
+        "-v", "error",
+        "-y",
+        "-f", "concat",
+        "-safe", "0",
+        "-i", list_path,
+        "-c", "copy",
+        "-movflags", "+faststart",
+        output_path,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stderr_task = asyncio.create_task(process.stderr.read())
+    try:
+        for i, (future, fifo_path) in enumerate(zip(segment_futures, fifo_paths)):
+            segment_path = (await _wait_segment(future, stages))[target]
+            if not segment_path:
+                print(f"Segment {i + 1} indisponible, assemblage en flux abandonné")
+                return False
+            try:
+                await asyncio.to_thread(_feed_fifo, fifo_path, segment_path, process)
+            except OSError as e:
+                print(f"Erreur lors de l'assemblage en flux: {e}")
+                return False
+            print(f"Segment {i + 1}/{len(segment_futures)} assemblé")
+        await process.wait()
+        if process.returncode != 0:
+            stderr = (await stderr_task).decode(errors="replace").strip()
+            print(f"Erreur lors de l'assemblage des segments: {stderr}")
+            return False
+        return True
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        stderr_task.cancel()
+
+
+def _clip_timecodes(segment_keys: list, segment_paths: list[str]) -> dict[int, float]:
+    """
+    Début de chaque clip dans la vidéo assemblée, en secondes, d'après la durée
+    réelle des segments qui le précèdent (intro et transitions comprises).
+    """
+    probe_cache = get_probe_cache()
+    timecodes = {}
+    current_time = 0.0
+    for key, path in zip(segment_keys, segment_paths):
+        if not isinstance(key, str):
+            timecodes[key] = current_time
+        try:
+            current_time += probe_cache.probe(path).duration
+        except ValueError as e:
+            print(f"Durée du segment {path} illisible, timecodes suivants décalés: {e}")
+    return timecodes
+
+
+async def render_bestof_pipeline(
+    clips: list[Clip],
+    output_path: str,
+    cache: Optional[ClipCache] = None,
+    normalize_workers: int = NORMALIZE_WORKERS,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    targets: tuple[OutputTarget, ...] = OUTPUT_TARGETS,
+) -> tuple[str, list[Clip], list[float]]:
+    """
+    Télécharge, normalise et assemble le best-of en pipeline.
+
+    Chaque clip part en normalisation dès la fin de son téléchargement (les
+    clips les plus tôt dans le best-of en priorité), et l'assemblage consomme
+    les segments dans l'ordre dès qu'ils sont prêts. Les files entre les étapes
+    sont bornées : seuls les chemins des fichiers transitent en mémoire.
+    Chaque clip n'est téléchargé et décodé qu'une fois pour toutes les sorties
+    `targets` : la première est la vidéo principale (output_path), les autres
+    sont écrites à côté (voir `target_output_path`).
+
+    Args:
+        clips: Clips du best-of, dans l'ordre de la vidéo
+        output_path: Fichier vidéo final
+        cache: Cache de clips (celui par défaut si absent)
+        normalize_workers: Nombre de processus de normalisation
+        queue_size: Taille maximale de la file entre téléchargement et normalisation
+        targets: Sorties à produire, la principale en premier
+
+    Returns:
+        (chemin de la vidéo principale ou "" en cas d'échec, clips effectivement
+        inclus, début de chacun de ces clips dans la vidéo principale en secondes)
+    """
+    if not clips:
+        print("Aucun clip à assembler.")
+        return "", [], []
+    cache = cache or ClipCache()
+    started = time.monotonic()
+
+    # Plan de la vidéo : les clips sont repérés par leur index, les vidéos fixes par leur chemin
+    items = []
+    if os.path.exists(INTRO_PATH):
+        items.append((INTRO_PATH, None))
+    for index, clip in enumerate(clips):
+        items.append((index, streamer_tag(clip.broadcaster_name)))
+    if os.path.exists(OUTRO_PATH):
+        items.append((OUTRO_PATH, None))
+    segments = interleave_transitions(items)
+
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    work_dir = os.path.join(output_dir or ".", f"segments_{os.getpid()}")
+    os.makedirs(work_dir, exist_ok=True)
+
+    loop = asyncio.get_running_loop()
+    # Un futur par segment distinct (la transition n'est rendue qu'une fois),
+    # qui donne le chemin du segment de chaque sortie
+    rendered: dict[object, asyncio.Future] = {}
+    for source, _ in segments:
+        if source not in rendered:
+            rendered[source] = loop.create_future()
+    segment_futures = [rendered[source] for source, _ in segments]
+    tags = dict(segments)
+
+    normalize_workers = max(1, normalize_workers)
+    # Profil choisi d'après les clips déjà vérifiés dans le cache (ceux du préchargement) :
+    # si l'un d'eux n'est pas encore téléchargé, le profil par défaut est gardé
+    infos = await asyncio.to_thread(lambda: [cache.get_media_info(clip.id) for clip in clips])
+    uncached = sum(1 for info in infos if info is None)
+    if uncached:
+        print(
+            f"{uncached}/{len(clips)} clips pas encore analysés dans le cache: "
+            f"profil de sortie par défaut, sans adaptation aux sources"
+        )
+    profile = worker_profile(select_output_profile(infos), normalize_workers)
+    print(f"Profil de sortie: {profile.width}x{profile.height} à {profile.fps} images/s")
+    profiles = [target_profile(profile, target) for target in targets]
+    queue: asyncio.PriorityQueue = asyncio.PriorityQueue(maxsize=queue_size)
+    render_pool = ProcessPoolExecutor(max_workers=normalize_workers)
+
+    segment_names = {key: f"segment_{i:03d}" for i, key in enumerate(rendered)}
+    # Temps d'encodage des statistiques : durée pendant laquelle au moins un segment
+    # est en rendu, sans les attentes de téléchargement entre deux rendus
+    active_renders = 0
+    busy_since = 0.0
+    busy_seconds = 0.0
+    last_render_end = 0.0
+
+    async def render(key, source_path: str):
+        nonlocal active_renders, busy_since, busy_seconds, last_render_end
+        if active_renders == 0:
+            busy_since = time.monotonic()
+        active_renders += 1
+        try:
+            await _render(key, source_path)
+        finally:
+            active_renders -= 1
+            if active_renders == 0:
+                last_render_end = time.monotonic()
+                busy_seconds += last_render_end - busy_since
+
+    async def _render(key, source_path: str):
+        if isinstance(key, str):
+            # Vidéo fixe : lue depuis le cache des vidéos fixes (rendue au premier usage)
+            result = await loop.run_in_executor(
+                render_pool, render_asset_targets, source_path, profiles
+            )
+            rendered[key].set_result(result)
+            return
+        segment_paths = [
+            os.path.join(work_dir, f"{segment_names[key]}_{target.name}.mp4")
+            for target in targets
+        ]
+        # Caractéristiques lues à la vérification du téléchargement : pas de nouvelle analyse
+        info = await asyncio.to_thread(cache.get_media_info, clips[key].id)
+        result = await loop.run_in_executor(
+            render_pool,
+            render_segment_targets,
+            source_path,
+            segment_paths,
+            tags[key],
+            profiles,
+            info,
+        )
+        if not rendered[key].done():
+            rendered[key].set_result(result)
+
+    async def normalize_worker():
+        while True:
+            index, path = await queue.get()
+            if path is None:
+                return
+            await render(index, path)
+
+    index_by_id = {clip.id: index for index, clip in enumerate(clips)}
+
+    async def on_ready(clip: Clip, path: str):
+        await queue.put((index_by_id[clip.id], path))
+
+    async def download_stage():
+        await cache.ensure(clips, on_ready=on_ready)
+        # Fin de la file pour chaque processus de normalisation (en cas d'erreur,
+        # finish_stages annule directement les processus de normalisation)
+        for _ in range(normalize_workers):
+            await queue.put((len(clips), None))
+
+    stages = None
+    try:
+        # Les vidéos fixes sont prises dans leur cache pendant les premiers téléchargements
+        asset_tasks = [
+            asyncio.create_task(render(source, source))
+            for source in rendered
+            if isinstance(source, str)
+        ]
+        workers = [
+            asyncio.create_task(normalize_worker()) for _ in range(normalize_workers)
+        ]
+        downloads = asyncio.create_task(download_stage())
+
+        async def finish_stages():
+            tasks = [downloads, *workers, *asset_tasks]
+            try:
+                # Une étape en échec (cache, processus de rendu perdu) arrête les autres :
+                # sinon le téléchargement attendrait une file que plus personne ne vide
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                for task in done:
+                    task.result()
+            finally:
+                # Ce qui n'a pas été rendu à la fin des étapes est en échec
+                for future in rendered.values():
+                    if not future.done():
+                        future.set_result([""] * len(targets))
+
+        stages = asyncio.create_task(finish_stages())
+
+        output_paths = [target_output_path(output_path, target) for target in targets]
+        streamed = [False] * len(targets)
+        if hasattr(os, "mkfifo"):
+            streamed = await asyncio.gather(
+                *(
+                    _stream_concat(segment_futures, target_path, work_dir, index, stages)
+                    for index, target_path in enumerate(output_paths)
+                )
+            )
+        await stages
+        elapsed = time.monotonic() - started
+        # Normalisation, plus la fin de l'assemblage en flux après le dernier segment
+        encode_seconds = busy_seconds
+        if last_render_end:
+            encode_seconds += time.monotonic() - last_render_end
+
+        assembled = []
+        for index, (target_path, target_prof) in enumerate(zip(output_paths, profiles)):
+            segment_paths = [future.result()[index] for future in segment_futures]
+            if not streamed[index]:
+                # Segment manquant (ou pas de tubes nommés) : concaténation des segments disponibles
+                segment_paths = select_segment_paths(segments, segment_paths)
+                concat_started = time.monotonic()
+                if not segment_paths or not await asyncio.to_thread(
+                    concat_segments, segment_paths, target_path
+                ):
+                    print(f"Échec de l'assemblage de {target_path}.")
+                    if index == 0:
+                        return "", [], []
+                    continue
+                target_seconds = encode_seconds + time.monotonic() - concat_started
+            else:
+                target_seconds = encode_seconds
+            record_render_stats(target_prof, target_path, target_seconds, len(clips))
+            assembled.append(segment_paths)
+
+        # Clips et timecodes de la vidéo principale
+        included_indexes = [index for index in range(len(clips)) if rendered[index].result()[0]]
+        included = [clips[index] for index in included_indexes]
+        # Segments réellement assemblés, lus avant la suppression des fichiers intermédiaires
+        key_by_path = {future.result()[0]: key for key, future in rendered.items()}
+        timecodes = await asyncio.to_thread(
+            _clip_timecodes, [key_by_path[path] for path in assembled[0]], assembled[0]
+        )
+        size_mb = os.path.getsize(output_path) / (1024 * 1024)
+        print(
+            f"Best-of assemblé en {elapsed:.1f}s dont {encode_seconds:.1f}s d'encodage "
+            f"({len(included)}/{len(clips)} clips, {size_mb:.2f} Mo, "
+            f"{len(assembled)} sortie(s))"
+        )
+        return output_path, included, [timecodes[index] for index in included_indexes]
+    finally:
+        if stages is not None and not stages.done():
+            stages.cancel()
+            await asyncio.gather(stages, return_exceptions=True)
+        render_pool.shutdown(cancel_futures=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
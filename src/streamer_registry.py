@@ -0,0 +1,195 @@
+import json
+import os
+import time
+from typing import Optional
+
+# Instantané des streamers identifiés et de leur activité (objet JSON, ou liste dans l'ancien format)
+STREAMERS_FILE = "data/tracked_streamers.json"
+# Journal des observations depuis le dernier instantané (une ligne JSON par observation)
+STREAMERS_JOURNAL_FILE = "data/tracked_streamers.jsonl"
+# Nombre d'entrées dans le journal au-delà duquel il est fusionné dans l'instantané
+COMPACT_EVERY = 500
+# Nombre d'IDs de streams conservés par streamer
+MAX_STREAM_IDS = 20
+
+
+class StreamerRegistry:
+    """
+    Registre des streamers suivis : index en mémoire et journal en ajout seul.
+
+    Pour chaque streamer, le registre garde la date de première et de dernière
+    observation, le nombre d'observations et les derniers IDs de streams vus.
+
+    Un ajout coûte O(1) (test d'appartenance dans un dict ordonné, une ligne
+    ajoutée au journal). Le journal est régulièrement fusionné dans
+    l'instantané, réécrit de façon atomique (fichier temporaire puis renommage).
+    Au chargement, l'instantané est lu puis le journal est rejoué ; une ligne
+    incomplète laissée par un arrêt brutal est ignorée.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: str = STREAMERS_FILE,
+        journal_path: str = STREAMERS_JOURNAL_FILE,
+        compact_every: int = COMPACT_EVERY,
+    ):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        # dict ordonné : conserve l'ordre de découverte des streamers
+        self._streamers: dict[str, dict] = {}
+        self._journal_entries = 0
+        self._needs_newline = False
+        self.load()
+
+    def __contains__(self, streamer: str) -> bool:
+        return streamer in self._streamers
+
+    def __len__(self) -> int:
+        return len(self._streamers)
+
+    @property
+    def streamers(self) -> list[str]:
+        """Streamers suivis, dans l'ordre où ils ont été découverts."""
+        return list(self._streamers)
+
+    def get(self, streamer: str) -> Optional[dict]:
+        """Retourne l'activité enregistrée pour un streamer (None s'il n'est pas suivi)."""
+        return self._streamers.get(streamer)
+
+    def active_streamers(self, within_seconds: float) -> list[str]:
+        """Retourne les streamers observés en direct au cours des `within_seconds` dernières secondes."""
+        since = time.time() - within_seconds
+        return [
+            streamer
+            for streamer, activity in self._streamers.items()
+            if activity.get("last_seen", 0) >= since
+        ]
+
+    def load(self):
+        """Charge l'instantané puis rejoue le journal."""
+        self._streamers = {}
+        self._journal_entries = 0
+        self._needs_newline = False
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r") as f:
+                    snapshot = json.load(f)
+                if isinstance(snapshot, list):
+                    # Ancien format : simple liste de noms, sans activité. On considère
+                    # ces streamers vus pour la dernière fois à l'écriture du fichier.
+                    seen_at = os.path.getmtime(self.snapshot_path)
+                    snapshot = {
+                        streamer: _new_activity(seen_at) for streamer in snapshot
+                    }
+                self._streamers = snapshot
+            except Exception as e:
+                print(f"Erreur lors du chargement des streamers suivis: {e}")
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r") as f:
+                content = f.read()
+            # Dernière ligne tronquée par un arrêt pendant l'écriture : le prochain
+            # ajout commencera par un saut de ligne pour ne pas la prolonger
+            self._needs_newline = bool(content) and not content.endswith("\n")
+            for line in content.splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._apply(entry)
+                self._journal_entries += 1
+
+    def _apply(self, entry: dict) -> bool:
+        """Applique une observation à l'index et retourne True si le streamer est nouveau."""
+        streamer = entry["login"]
+        seen_at = entry.get("seen_at", time.time())
+        activity = self._streamers.get(streamer)
+        is_new = activity is None
+        if is_new:
+            activity = _new_activity(seen_at)
+            activity["seen_count"] = 0
+            self._streamers[streamer] = activity
+
+        activity["last_seen"] = max(activity.get("last_seen", 0), seen_at)
+        activity["seen_count"] = activity.get("seen_count", 0) + 1
+        if entry.get("user_id"):
+            activity["user_id"] = entry["user_id"]
+        stream_id = entry.get("stream_id")
+        if stream_id:
+            stream_ids = activity.setdefault("stream_ids", [])
+            if stream_id not in stream_ids:
+                stream_ids.append(stream_id)
+                del stream_ids[:-MAX_STREAM_IDS]
+        return is_new
+
+    def record_sightings(
+        self, sightings: list[dict], seen_at: Optional[float] = None
+    ) -> int:
+        """
+        Enregistre les streamers observés en direct lors d'une vérification.
+
+        Args:
+            sightings: Observations {"login", et optionnellement "stream_id", "user_id"}
+            seen_at: Horodatage de la vérification (maintenant par défaut)
+
+        Returns:
+            Nombre de streamers qui n'étaient pas encore suivis
+        """
+        if not sightings:
+            return 0
+        seen_at = time.time() if seen_at is None else seen_at
+        entries = [{**sighting, "seen_at": seen_at} for sighting in sightings]
+        new_streamers = sum(self._apply(entry) for entry in entries)
+
+        parent_dir = os.path.dirname(self.journal_path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        try:
+            lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+            if self._needs_newline:
+                lines = "\n" + lines
+            with open(self.journal_path, "a") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._needs_newline = False
+            self._journal_entries += len(entries)
+        except Exception as e:
+            print(f"Erreur lors de l'enregistrement des streamers suivis: {e}")
+
+        if self._journal_entries >= self.compact_every:
+            self.compact()
+        return new_streamers
+
+    def add(self, streamer: str) -> bool:
+        """Ajoute un streamer et retourne True s'il n'était pas encore suivi."""
+        return self.add_many([streamer]) == 1
+
+    def add_many(self, streamers: list[str]) -> int:
+        """Enregistre une observation pour plusieurs streamers et retourne le nombre de nouveaux."""
+        return self.record_sightings([{"login": streamer} for streamer in streamers])
+
+    def compact(self):
+        """Réécrit l'instantané de façon atomique puis vide le journal."""
+        parent_dir = os.path.dirname(self.snapshot_path)
+        if parent_dir:
+            os.makedirs(parent_dir, exist_ok=True)
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._streamers, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # Un arrêt avant cette ligne ne perd rien : le journal serait simplement
+            # rejoué une fois de plus (seul seen_count serait alors surestimé)
+            open(self.journal_path, "w").close()
+            self._journal_entries = 0
+            self._needs_newline = False
+        except Exception as e:
+            print(f"Erreur lors de la compaction des streamers suivis: {e}")
+
+
+def _new_activity(seen_at: float) -> dict:
+    return {"first_seen": seen_at, "last_seen": seen_at, "seen_count": 1, "stream_ids": []}
@@ -1,41 +1,51 @@
 import asyncio
-import json
 import os
-import time
 from datetime import datetime
-from src.twitchClips import login, get_broadcasters
-
-# Fichier pour stocker les streamers identifiés
-STREAMERS_FILE = "data/tracked_streamers.json"
+from typing import Optional
+from twitchAPI.twitch import Twitch
+from src.twitchClips import login, get_live_streams
+from src.streamer_registry import StreamerRegistry
+from src.rate_limiter import TokenBucket, create_helix_rate_limiter
 
 
 async def monitor_streamers(
     game_id: str,
     search_terms: list[str],
     interval_minutes: int = 15,
-    max_streamers_per_check: int = 10,
+    max_streamers_per_check: Optional[int] = None,
+    min_viewers: int = 0,
+    rate_limiter: Optional[TokenBucket] = None,
+    twitch: Optional[Twitch] = None,
 ):
     """
     Surveille en continu les streamers qui diffusent un jeu spécifique avec certains termes dans le titre.
-    Exécute la vérification à intervalles réguliers et enregistre les streamers identifiés.
+    Exécute la vérification à intervalles réguliers et enregistre les streamers identifiés,
+    avec leur dernière observation, leur nombre d'observations et les IDs des streams vus.
 
     Args:
         game_id: ID du jeu à surveiller
         search_terms: Liste des termes à rechercher dans les titres
         interval_minutes: Intervalle entre les vérifications en minutes
         max_streamers_per_check: Nombre maximum de streamers à récupérer par vérification
+            (None: tous les streams en direct du jeu sont parcourus)
+        min_viewers: Nombre de spectateurs en dessous duquel le parcours s'arrête
+        rate_limiter: Limiteur partagé des requêtes Helix (créé si absent)
+        twitch: Instance Twitch authentifiée partagée (une connexion est ouverte si absente).
+            Une instance partagée est gardée après une erreur : seule une connexion
+            ouverte ici est refaite.
     """
     # S'assurer que le dossier data existe
     os.makedirs("data", exist_ok=True)
 
     # Charger les streamers déjà suivis
-    tracked_streamers = load_tracked_streamers()
+    tracked_streamers = StreamerRegistry()
+    if rate_limiter is None:
+        rate_limiter = create_helix_rate_limiter()
 
     print(f"Service de surveillance des streamers démarré pour le jeu {game_id}")
     print(f"Recherche des termes: {', '.join(search_terms)}")
     print(f"Intervalle de vérification: {interval_minutes} minutes")
-
-    twitch = None
+    owns_twitch = twitch is None
 
     try:
         while True:
@@ -49,24 +59,29 @@ async def monitor_streamers(
                 print(
                     f"\n[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Recherche de streamers en direct..."
                 )
-                current_streamers = await get_broadcasters(
+                current_streams = await get_live_streams(
                     twitch,
                     game_id,
                     search_terms,
                     first_count=100,
                     max_streamers=max_streamers_per_check,
+                    min_viewers=min_viewers,
+                    rate_limiter=rate_limiter,
                 )
 
-                # Mettre à jour la liste des streamers suivis
-                new_streamers = 0
-                for streamer in current_streamers:
-                    if streamer not in tracked_streamers:
-                        tracked_streamers.append(streamer)
-                        new_streamers += 1
+                # Enregistrer l'activité des streamers vus (ajout au journal, sans réécriture)
+                new_streamers = tracked_streamers.record_sightings(
+                    [
+                        {
+                            "login": stream.user_name,
+                            "stream_id": stream.stream_id,
+                            "user_id": stream.user_id,
+                        }
+                        for stream in current_streams
+                    ]
+                )
 
-                # Enregistrer la liste mise à jour
                 if new_streamers > 0:
-                    save_tracked_streamers(tracked_streamers)
                     print(
                         f"Ajouté {new_streamers} nouveaux streamers à la liste de suivi (total: {len(tracked_streamers)})"
                     )
@@ -77,7 +92,10 @@ async def monitor_streamers(
 
             except Exception as e:
                 print(f"Erreur lors de la vérification des streamers: {e}")
-                twitch = None  # Forcer une reconnexion lors de la prochaine itération
+                if owns_twitch and twitch is not None:
+                    # Connexion propre à la surveillance : refaite à la prochaine itération
+                    await twitch.close()
+                    twitch = None
 
             # Attendre l'intervalle spécifié avant la prochaine vérification
             print(f"Prochaine vérification dans {interval_minutes} minutes...")
@@ -85,23 +103,11 @@ async def monitor_streamers(
 
     except KeyboardInterrupt:
         print("\nSurveillance des streamers arrêtée par l'utilisateur.")
+    finally:
+        if owns_twitch and twitch is not None:
+            await twitch.close()
 
 
 def load_tracked_streamers() -> list:
-    """Charge la liste des streamers suivis depuis le fichier JSON."""
-    if os.path.exists(STREAMERS_FILE):
-        try:
-            with open(STREAMERS_FILE, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Erreur lors du chargement des streamers suivis: {e}")
-    return []
-
-
-def save_tracked_streamers(streamers: list):
-    """Enregistre la liste des streamers suivis dans un fichier JSON."""
-    try:
-        with open(STREAMERS_FILE, "w") as f:
-            json.dump(streamers, f)
-    except Exception as e:
-        print(f"Erreur lors de l'enregistrement des streamers suivis: {e}")
+    """Charge la liste des streamers suivis depuis le registre (instantané + journal)."""
+    return StreamerRegistry().streamers
@@ -0,0 +1,142 @@
+import re
+from functools import lru_cache
+
+# Toutes les formes de crochets sont ramenées à [ et ]
+_BRACKETS_TABLE = str.maketrans({"(": "[", "{": "[", "【": "[", ")": "]", "}": "]", "】": "]"})
+# Mots d'un terme : "[MindCityRP]" -> [, Mind, City, RP, ]
+_TOKEN_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+|[^\w\s\-_.·|:]")
+# Motifs d'un titre en minuscules : séparateurs optionnels entre les mots, crochets de toute forme.
+# "[MindCity RP]", "[MindCity-RP]" et "[MindCityRP]" sont équivalents
+_SEPARATOR_PATTERN = r"[\s\-_.·|:]*"
+_BRACKET_PATTERNS = {"[": r"[\[({【]", "]": r"[\])}】]"}
+# Marque de fin d'un terme dans l'arbre des mots
+_END = ""
+
+
+def _term_tokens(term: str) -> list[str]:
+    """Découpe un terme en mots (changements de casse, chiffres, séparateurs), en minuscules."""
+    return [token.lower() for token in _TOKEN_RE.findall(term.translate(_BRACKETS_TABLE))]
+
+
+def _token_pattern(token: str) -> str:
+    return _BRACKET_PATTERNS.get(token, re.escape(token))
+
+
+def _trie_pattern(node: dict) -> str:
+    """
+    Motif d'un arbre de mots : les termes qui commencent par les mêmes mots
+    partagent leur début de motif ("[MindCity]" et "[MindCityRP]" ne divergent
+    qu'après "city"), le moteur d'expressions régulières ne le teste qu'une fois.
+    """
+    alternatives = []
+    for token, child in node.items():
+        if token == _END:
+            continue
+        pattern = _token_pattern(token)
+        rest = _trie_pattern(child)
+        if rest:
+            tail = _SEPARATOR_PATTERN + rest
+            pattern += f"(?:{tail})?" if _END in child else tail
+        alternatives.append(pattern)
+    if len(alternatives) <= 1:
+        return "".join(alternatives)
+    return "(?:" + "|".join(alternatives) + ")"
+
+
+class TitleMatcher:
+    """
+    Détecteur compilé de termes dans des titres de streams ou de clips.
+
+    Chaque terme est découpé en mots ("[MindCityRP]" : crochet, mind, city, rp,
+    crochet), puis compilé en un motif qui tolère les séparateurs entre les mots
+    et toutes les formes de crochets. Le titre est seulement mis en minuscules :
+    un test de sous-chaîne sur le mot le plus long de chaque terme écarte la
+    plupart des titres, et une seule expression régulière traite les autres.
+    """
+
+    def __init__(self, terms: list[str]):
+        # Termes d'origine regroupés par forme normalisée
+        self.terms_by_key: dict[str, list[str]] = {}
+        tokens_by_key: dict[str, list[str]] = {}
+        for term in terms:
+            tokens = _term_tokens(term)
+            key = "".join(tokens)
+            if key:
+                self.terms_by_key.setdefault(key, []).append(term)
+                tokens_by_key.setdefault(key, tokens)
+
+        keys = sorted(self.terms_by_key, key=len, reverse=True)
+        # Une clé trouvée implique la présence de toutes les clés qu'elle contient
+        self._implied: dict[str, list[str]] = {
+            key: [other for other in keys if other in key] for key in keys
+        }
+        self._keys = keys
+        # Chaque mot apparaît tel quel dans un titre correspondant : le plus long sert de filtre
+        required = {
+            max((token for token in tokens_by_key[key] if token.isalnum()), key=len, default="")
+            for key in keys
+        }
+        # Un terme sans mot (ponctuation seule) ne permet pas de filtrer : tous les titres sont testés
+        self._required = () if "" in required else tuple(required)
+        trie: dict = {}
+        for tokens in tokens_by_key.values():
+            node = trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[_END] = {}
+        self._pattern = re.compile(_trie_pattern(trie)) if keys else None
+        self._search = self._pattern.search if keys else None
+        patterns = [
+            _SEPARATOR_PATTERN.join(_token_pattern(token) for token in tokens_by_key[key])
+            for key in keys
+        ]
+        # Lookahead : la clé la plus longue est capturée à chaque position, chevauchements compris
+        self._all_pattern = (
+            re.compile("(?=" + "|".join(f"({pattern})" for pattern in patterns) + ")")
+            if keys
+            else None
+        )
+
+    def _candidate(self, title_lower: str) -> bool:
+        """Filtre rapide : le titre contient-il le mot le plus long d'au moins un terme ?"""
+        return not self._required or any(token in title_lower for token in self._required)
+
+    def matched_terms(self, title: str) -> list[str]:
+        """
+        Retourne les termes présents dans le titre, en un seul parcours.
+        Les variantes d'un même terme normalisé ne sont rapportées qu'une fois.
+        """
+        if self._all_pattern is None or not title:
+            return []
+        title_lower = title.lower()
+        if not self._candidate(title_lower):
+            return []
+        found: dict[str, None] = {}
+        for match in self._all_pattern.finditer(title_lower):
+            for key in self._implied[self._keys[match.lastindex - 1]]:
+                found[key] = None
+        return [self.terms_by_key[key][0] for key in found]
+
+    def matches(self, title: str) -> bool:
+        """Indique si le titre contient au moins un des termes."""
+        if self._pattern is None or not title:
+            return False
+        title_lower = title.lower()
+        if not self._required:
+            return self._search(title_lower) is not None
+        for token in self._required:
+            if token in title_lower:
+                return self._search(title_lower) is not None
+        return False
+
+
+@lru_cache(maxsize=32)
+def _compile(terms: tuple[str, ...]) -> TitleMatcher:
+    return TitleMatcher(list(terms))
+
+
+def get_title_matcher(terms: list[str] | str) -> TitleMatcher:
+    """Retourne un TitleMatcher pour ces termes, compilé une seule fois par ensemble de termes."""
+    if isinstance(terms, str):
+        terms = [terms]
+    return _compile(tuple(terms))
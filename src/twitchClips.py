@@ -1,11 +1,18 @@
 from twitchAPI.twitch import Twitch
 from twitchAPI.helper import first
 from datetime import datetime, timedelta, timezone
-import asyncio
 import os
 import subprocess
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from dotenv import load_dotenv  # Ajouté pour charger les variables d'environnement
+from src.rate_limiter import TokenBucket
+from src.broadcaster_cache import BroadcasterIdCache
+from src.title_matcher import get_title_matcher
+from src.clip_cache import ClipCache
+from src.clip_downloader import get_download_engine
+from src.media_probe import verify_clip_file
 
 
 @dataclass
@@ -20,11 +27,33 @@ class Clip:
     view_count: int = 0
     created_at: str = ""
     duration: float = 0
+    broadcaster_id: str = ""
+
+
+@dataclass
+class LiveStream:
+    """Classe représentant un stream en direct correspondant aux termes recherchés."""
+
+    user_name: str
+    user_id: str = ""
+    stream_id: str = ""
+    title: str = ""
+    viewer_count: int = 0
 
 
 # Charger les variables d'environnement depuis un fichier .env
 load_dotenv()
 
+# Nombre maximum d'utilisateurs par requête get_users (limite de l'API Helix)
+USERS_BATCH_SIZE = 100
+# Nombre maximum d'IDs de clips par requête get_clips
+CLIPS_BATCH_SIZE = 100
+# Nombre de noms de streamers gardés en mémoire entre deux appels
+BROADCASTER_NAMES_CACHE_SIZE = 10000
+
+# Cache LRU en mémoire ID de streamer -> nom affiché
+_broadcaster_names: OrderedDict[str, str] = OrderedDict()
+
 
 async def login() -> Twitch:
     client_id = os.getenv("TWITCH_CLIENT_ID")
@@ -38,7 +67,7 @@ async def login() -> Twitch:
     return twitch
 
 
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 
 async def get_clips_with_term(
@@ -48,11 +77,18 @@ async def get_clips_with_term(
     broadcaster_id: Optional[str] = None,
     first_count: int = 100,
     max_clips: int = 500,
-) -> list[Clip]:
+    rate_limiter: Optional[TokenBucket] = None,
+    started_at: Optional[datetime] = None,
+    ended_at: Optional[datetime] = None,
+    raise_errors: bool = False,
+) -> AsyncIterator[Clip]:
     """
-    Récupère les clips de la semaine dernière pour un jeu et/ou un streamer spécifique.
+    Récupère les clips de la semaine dernière (ou d'une période donnée) pour un jeu et/ou un streamer spécifique.
     Filtre les clips dont le titre contient le terme donné, si fourni.
 
+    Les clips sont produits page par page, au fur et à mesure de la pagination,
+    sans conserver l'ensemble des résultats en mémoire.
+
     Args:
         twitch: Instance Twitch authentifiée
         game_id: ID du jeu (optionnel si broadcaster_id est fourni)
@@ -60,9 +96,14 @@ async def get_clips_with_term(
         broadcaster_id: ID du streamer (optionnel si game_id est fourni)
         first_count: Nombre de clips par page (max 100)
         max_clips: Nombre maximum total de clips à récupérer
-
-    Returns:
-        Liste d'objets Clip correspondant aux critères
+        rate_limiter: Limiteur partagé consulté avant chaque page (optionnel)
+        started_at: Début de la période (par défaut il y a 7 jours)
+        ended_at: Fin de la période (par défaut maintenant)
+        raise_errors: Propage les erreurs de l'API au lieu d'arrêter la pagination
+            en silence (pour savoir si la période a été entièrement parcourue)
+
+    Yields:
+        Objets Clip correspondant aux critères
     """
     # Vérifier qu'au moins un critère de filtrage est fourni
     if game_id is None and broadcaster_id is None:
@@ -70,9 +111,9 @@ async def get_clips_with_term(
             "Au moins un des paramètres game_id ou broadcaster_id doit être fourni"
         )
 
-    # Calculer la période de la semaine dernière
-    now = datetime.now(timezone.utc)
-    last_week = now - timedelta(days=7)
+    # Calculer la période demandée (la semaine dernière par défaut)
+    now = ended_at or datetime.now(timezone.utc)
+    last_week = started_at or now - timedelta(days=7)
 
     print(
         f"Recherche de clips depuis {last_week.isoformat()} jusqu'à {now.isoformat()}"
@@ -84,11 +125,10 @@ async def get_clips_with_term(
     if term:
         print(f"Contenant le terme: '{term}'")
 
-    # Récupérer les clips
-    clips = []
+    # Clips bruts de la page en cours, convertis dès que la page est complète
+    page = []
     clip_count = 0
-    batch_count = 0
-    request_delay = 4.0  # 4 secondes entre chaque lot
+    yielded_count = 0
 
     try:
         # Préparer les paramètres pour la requête
@@ -105,7 +145,9 @@ async def get_clips_with_term(
                 "Au moins un des paramètres game_id ou broadcaster_id doit être fourni"
             )
 
-        # Obtenir le générateur de clips
+        # Obtenir le générateur de clips (la première page part à la première itération)
+        if rate_limiter:
+            await rate_limiter.acquire()
         clip_generator = twitch.get_clips(**clip_params)
 
         # Récupérer les clips jusqu'à la limite
@@ -115,61 +157,75 @@ async def get_clips_with_term(
                 if not hasattr(clip, "game_id") or str(clip.game_id) != str(game_id):
                     continue  # Ignore les clips qui ne sont pas du jeu demandé
 
-            if not hasattr(clip, "broadcaster_name") or not clip.broadcaster_name:
-                try:
-                    user = await first(twitch.get_users(user_ids=[clip.broadcaster_id]))
-                    if user and hasattr(user, "display_name"):
-                        clip.broadcaster_name = user.display_name
-                    elif user and hasattr(user, "login"):
-                        clip.broadcaster_name = user.login
-                    else:
-                        clip.broadcaster_name = clip.broadcaster_id
-                except Exception as e:
-                    print(
-                        f"Erreur lors de la récupération du nom du broadcaster pour l'ID {clip.broadcaster_id}: {e}"
-                    )
-                    clip.broadcaster_name = clip.broadcaster_id
-
-            clips.append(clip)
+            page.append(clip)
             clip_count += 1
 
-            if clip_count % 10 == 0:
-                print(f"Récupéré {clip_count} clips...")
-
             if clip_count >= max_clips:
                 print(f"Atteint la limite de {max_clips} clips")
                 break
 
-            # Ajouter un délai tous les 'first_count' clips pour éviter le rate limit
+            # Une page complète a été consommée : la produire avant de demander la suivante
             if clip_count % first_count == 0:
-                batch_count += 1
-                print(
-                    f"Délai de {request_delay} secondes après le lot {batch_count}..."
-                )
-                await asyncio.sleep(request_delay)
+                for clip_obj in await _convert_clips(twitch, page, term, rate_limiter):
+                    yielded_count += 1
+                    yield clip_obj
+                page = []
+                print(f"Récupéré {clip_count} clips...")
+                if rate_limiter:
+                    await rate_limiter.acquire()
 
     except Exception as e:
         print(f"Erreur lors de la récupération des clips: {e}")
+        if raise_errors:
+            raise
+
+    for clip_obj in await _convert_clips(twitch, page, term, rate_limiter):
+        yielded_count += 1
+        yield clip_obj
+
+    print(
+        f"Récupéré {clip_count} clips au total, {yielded_count} retenus"
+        + (f" contenant le terme '{term}'" if term else "")
+    )
 
-    print(f"Récupéré {len(clips)} clips au total")
 
-    # Si un terme est fourni, on filtre par titre, sinon on retourne tous les clips
+async def _convert_clips(
+    twitch: Twitch,
+    raw_clips: list,
+    term: Optional[str],
+    rate_limiter: Optional[TokenBucket] = None,
+) -> list[Clip]:
+    """
+    Filtre une page de clips bruts par terme, complète les noms de streamers
+    manquants par lots, puis convertit les clips en objets Clip.
+    """
+    # Si un terme est fourni, on filtre par titre, sinon on garde tous les clips
     if term:
-        term_lower = term.lower()
-        filtered_clips = [
+        matcher = get_title_matcher(term)
+        raw_clips = [
             clip
-            for clip in clips
-            if hasattr(clip, "title") and term_lower in clip.title.lower()
+            for clip in raw_clips
+            if hasattr(clip, "title") and matcher.matches(clip.title)
         ]
-        print(
-            f"Après filtrage: {len(filtered_clips)} clips contenant le terme '{term}'"
+
+    # Les noms manquants sont résolus en une seule requête groupée
+    missing_name_clips = [
+        clip
+        for clip in raw_clips
+        if not hasattr(clip, "broadcaster_name") or not clip.broadcaster_name
+    ]
+    if missing_name_clips:
+        names = await resolve_broadcaster_names(
+            twitch,
+            [clip.broadcaster_id for clip in missing_name_clips],
+            rate_limiter=rate_limiter,
         )
-    else:
-        filtered_clips = clips
+        for clip in missing_name_clips:
+            clip.broadcaster_name = names.get(clip.broadcaster_id) or clip.broadcaster_id
 
     # Convertir en objets Clip
     result_clips = []
-    for clip in filtered_clips:
+    for clip in raw_clips:
         try:
             clip_obj = Clip(
                 id=clip.id,
@@ -180,15 +236,95 @@ async def get_clips_with_term(
                 view_count=getattr(clip, "view_count", 0),
                 created_at=getattr(clip, "created_at", ""),
                 duration=getattr(clip, "duration", 0),
+                broadcaster_id=getattr(clip, "broadcaster_id", ""),
             )
             result_clips.append(clip_obj)
         except AttributeError as e:
             print(f"Erreur lors de la conversion du clip: {e}")
-
-    print(f"Converti {len(result_clips)} clips en objets Clip")
     return result_clips
 
 
+async def refresh_clip_view_counts(
+    twitch: Twitch,
+    clip_ids: list[str],
+    rate_limiter: Optional[TokenBucket] = None,
+) -> dict[str, int]:
+    """
+    Récupère le nombre de vues actuel de clips déjà connus, par lots de 100 IDs.
+
+    Args:
+        twitch: Instance Twitch authentifiée
+        clip_ids: IDs des clips à rafraîchir
+        rate_limiter: Limiteur partagé consulté avant chaque requête (optionnel)
+
+    Returns:
+        Dictionnaire ID -> nombre de vues. Un clip absent d'un lot traité sans
+        erreur a été supprimé sur Twitch et est associé à -1.
+    """
+    view_counts = {}
+    for start in range(0, len(clip_ids), CLIPS_BATCH_SIZE):
+        batch = clip_ids[start : start + CLIPS_BATCH_SIZE]
+        try:
+            if rate_limiter:
+                await rate_limiter.acquire()
+            batch_counts = {}
+            async for clip in twitch.get_clips(clip_id=batch, first=len(batch)):
+                batch_counts[clip.id] = clip.view_count
+        except Exception as e:
+            print(f"Erreur lors du rafraîchissement des vues de {len(batch)} clips: {e}")
+            continue
+        for clip_id in batch:
+            view_counts[clip_id] = batch_counts.get(clip_id, -1)
+    return view_counts
+
+
+async def resolve_broadcaster_names(
+    twitch: Twitch,
+    broadcaster_ids: list[str],
+    rate_limiter: Optional[TokenBucket] = None,
+) -> dict[str, str]:
+    """
+    Récupère les noms affichés de plusieurs streamers par lots de 100 IDs.
+    Les noms sont conservés dans un cache LRU en mémoire partagé entre les appels.
+
+    Args:
+        twitch: Instance Twitch authentifiée
+        broadcaster_ids: IDs des streamers (les doublons sont ignorés)
+        rate_limiter: Limiteur partagé consulté avant chaque requête (optionnel)
+
+    Returns:
+        Dictionnaire ID -> nom affiché pour les IDs trouvés
+    """
+    names = {}
+    pending = []
+    for broadcaster_id in dict.fromkeys(broadcaster_ids):
+        if broadcaster_id in _broadcaster_names:
+            _broadcaster_names.move_to_end(broadcaster_id)
+            names[broadcaster_id] = _broadcaster_names[broadcaster_id]
+        else:
+            pending.append(broadcaster_id)
+
+    for start in range(0, len(pending), USERS_BATCH_SIZE):
+        batch = pending[start : start + USERS_BATCH_SIZE]
+        try:
+            if rate_limiter:
+                await rate_limiter.acquire()
+            async for user in twitch.get_users(user_ids=batch):
+                name = getattr(user, "display_name", None) or user.login
+                names[user.id] = name
+                _broadcaster_names[user.id] = name
+                _broadcaster_names.move_to_end(user.id)
+        except Exception as e:
+            print(
+                f"Erreur lors de la récupération des noms pour un lot de {len(batch)} streamers: {e}"
+            )
+
+    while len(_broadcaster_names) > BROADCASTER_NAMES_CACHE_SIZE:
+        _broadcaster_names.popitem(last=False)
+
+    return names
+
+
 async def get_game_id(twitch: Twitch, game_name: str) -> str:
     game = await first(twitch.get_games(names=[game_name]))
     if game:
@@ -196,107 +332,146 @@ async def get_game_id(twitch: Twitch, game_name: str) -> str:
     raise ValueError(f"Game '{game_name}' not found.")
 
 
-async def get_broadcasters(
+async def get_live_streams(
     twitch: Twitch,
     game_id: str,
     terms: list[str] | str,
     first_count: int = 100,
-    max_streamers: int = 2,
-) -> list:
+    max_streamers: Optional[int] = None,
+    min_viewers: int = 0,
+    rate_limiter: Optional[TokenBucket] = None,
+) -> list[LiveStream]:
     """
-    Récupère les streamers qui diffusent actuellement (à l'instant T) un jeu spécifique
-    et dont le titre du stream contient un ou plusieurs termes donnés.
+    Récupère les streams en direct (à l'instant T) d'un jeu spécifique dont le
+    titre contient un ou plusieurs termes donnés.
+
+    Par défaut, tous les streams en direct du jeu sont parcourus. Helix renvoie
+    les streams par nombre de spectateurs décroissant : le parcours s'arrête au
+    premier stream sous `min_viewers`.
 
     Args:
         twitch: Instance Twitch authentifiée
         game_id: ID du jeu
         terms: Terme(s) à rechercher dans le titre du stream (chaîne ou liste de chaînes)
         first_count: Nombre de streams par page (max 100)
-        max_streamers: Nombre maximum total de streamers à récupérer
+        max_streamers: Nombre maximum de streamers à récupérer (None: aucune limite)
+        min_viewers: Nombre de spectateurs en dessous duquel le parcours s'arrête
+        rate_limiter: Limiteur partagé consulté avant chaque page (optionnel)
 
     Returns:
-        Liste des streamers correspondants
+        Liste des streams correspondants (nom, IDs du streamer et du stream, titre, spectateurs)
     """
     # Convertir le terme en liste s'il est fourni comme chaîne
     if isinstance(terms, str):
         terms = [terms]
 
-    terms_lower = [term.lower() for term in terms]
+    # Compilé une seule fois par ensemble de termes, variantes d'espacement et de crochets incluses
+    matcher = get_title_matcher(terms)
     terms_str = "', '".join(terms)
 
     print(
         f"Recherche de streamers diffusant actuellement le jeu ID {game_id} avec l'un des termes suivants dans le titre: '{terms_str}'"
     )
 
-    # Liste pour stocker les noms des streamers
+    # Liste pour stocker les streams correspondants
     broadcasters = []
     stream_count = 0
-    batch_count = 0
-    request_delay = 4.0  # 4 secondes entre chaque lot
+    started = time.monotonic()
 
     try:
-        # Obtenir le générateur de streams actuels
+        # Obtenir le générateur de streams actuels (la première page part à la première itération)
+        if rate_limiter:
+            await rate_limiter.acquire()
         stream_generator = twitch.get_streams(game_id=[game_id], first=first_count)
 
         # Parcourir les streams et filtrer ceux avec un des termes dans le titre
         async for stream in stream_generator:
             stream_count += 1
 
-            # Vérifier si le titre contient l'un des termes recherchés
-            if hasattr(stream, "title") and hasattr(stream, "user_name"):
-                title_lower = stream.title.lower()
-
-                # Vérifier si l'un des termes est présent dans le titre
-                if any(term in title_lower for term in terms_lower):
-                    # Filtrer les noms d'utilisateur avec des caractères non-ASCII
-                    if all(c.isascii() for c in stream.user_name):
-                        # Trouver quel terme a matché pour l'afficher
-                        matched_terms = [
-                            term for term in terms_lower if term in title_lower
-                        ]
-                        matched_str = "', '".join(matched_terms)
-
-                        broadcasters.append(stream.user_name)
-                        print(
-                            f"Trouvé streamer: {stream.user_name} - Titre: {stream.title}"
-                        )
-                        print(f"  >> Termes trouvés: '{matched_str}'")
-
-            # Afficher la progression
-            if stream_count % 10 == 0:
+            # Les streams suivants ont encore moins de spectateurs
+            if min_viewers and getattr(stream, "viewer_count", 0) < min_viewers:
                 print(
-                    f"Analysé {stream_count} streams, trouvé {len(broadcasters)} streamers..."
+                    f"Arrêt du parcours: stream sous le seuil de {min_viewers} spectateurs"
                 )
+                break
+
+            # Vérifier si le titre contient l'un des termes recherchés (un seul parcours)
+            if hasattr(stream, "title") and hasattr(stream, "user_name"):
+                matched_terms = matcher.matched_terms(stream.title)
+
+                # Filtrer les noms d'utilisateur avec des caractères non-ASCII
+                if matched_terms and stream.user_name.isascii():
+                    matched_str = "', '".join(matched_terms)
+
+                    broadcasters.append(
+                        LiveStream(
+                            user_name=stream.user_name,
+                            user_id=getattr(stream, "user_id", ""),
+                            stream_id=getattr(stream, "id", ""),
+                            title=stream.title,
+                            viewer_count=getattr(stream, "viewer_count", 0),
+                        )
+                    )
+                    print(
+                        f"Trouvé streamer: {stream.user_name} - Titre: {stream.title}"
+                    )
+                    print(f"  >> Termes trouvés: '{matched_str}'")
 
             # Arrêter si on atteint le nombre maximum de streamers
-            if len(broadcasters) >= max_streamers:
+            if max_streamers is not None and len(broadcasters) >= max_streamers:
                 print(f"Atteint la limite de {max_streamers} streamers")
                 break
 
-            # Ajouter un délai tous les first_count streams
-            if stream_count % first_count == 0 and stream_count > 0:
-                batch_count += 1
+            # Une page complète a été consommée : la suivante coûte une requête
+            if stream_count % first_count == 0:
                 print(
-                    f"Délai de {request_delay} secondes après le lot {batch_count}..."
+                    f"Analysé {stream_count} streams, trouvé {len(broadcasters)} streamers..."
                 )
-                await asyncio.sleep(request_delay)
+                if rate_limiter:
+                    await rate_limiter.acquire()
 
     except Exception as e:
         print(f"Erreur lors de la récupération des streamers: {e}")
 
+    elapsed = time.monotonic() - started
+    rate = stream_count / elapsed if elapsed > 0 else 0.0
     print(
         f"Trouvé {len(broadcasters)} streamers diffusant actuellement le jeu ID {game_id} avec l'un des termes recherchés"
     )
+    print(f"Analysé {stream_count} streams en {elapsed:.1f}s ({rate:.0f} streams/s)")
     return broadcasters
 
 
-async def get_broadcaster_id(twitch: Twitch, username: str) -> str:
+async def get_broadcasters(
+    twitch: Twitch,
+    game_id: str,
+    terms: list[str] | str,
+    first_count: int = 100,
+    max_streamers: int = 2,
+) -> list:
+    """
+    Récupère les streamers qui diffusent actuellement (à l'instant T) un jeu spécifique
+    et dont le titre du stream contient un ou plusieurs termes donnés.
+
+    Returns:
+        Liste des noms des streamers correspondants
+    """
+    streams = await get_live_streams(
+        twitch, game_id, terms, first_count=first_count, max_streamers=max_streamers
+    )
+    return [stream.user_name for stream in streams]
+
+
+async def get_broadcaster_id(
+    twitch: Twitch, username: str, rate_limiter: Optional[TokenBucket] = None
+) -> str:
     """
     Récupère l'ID d'un streamer à partir de son nom d'utilisateur.
 
     Args:
         twitch: Instance Twitch authentifiée
         username: Nom d'utilisateur du streamer
+        rate_limiter: Limiteur partagé consulté avant la requête (optionnel)
 
     Returns:
         ID du streamer
@@ -314,6 +489,8 @@ async def get_broadcaster_id(twitch: Twitch, username: str) -> str:
             )
             username = filtered_username
 
+        if rate_limiter:
+            await rate_limiter.acquire()
         user = await first(twitch.get_users(logins=[username]))
         if user:
             return user.id
@@ -324,13 +501,90 @@ async def get_broadcaster_id(twitch: Twitch, username: str) -> str:
         )
 
 
-def download_clip(url_clip: str, destination_file: str) -> bool:
+async def resolve_broadcaster_ids(
+    twitch: Twitch,
+    usernames: list[str],
+    cache: Optional[BroadcasterIdCache] = None,
+    rate_limiter: Optional[TokenBucket] = None,
+) -> dict[str, Optional[str]]:
+    """
+    Récupère les IDs de plusieurs streamers en regroupant les logins par lots de 100.
+    Les résultats (y compris les logins introuvables) sont conservés dans un cache disque.
+
+    Args:
+        twitch: Instance Twitch authentifiée
+        usernames: Noms d'utilisateur des streamers
+        cache: Cache login -> ID (celui de data/ par défaut)
+        rate_limiter: Limiteur partagé consulté avant chaque requête (optionnel)
+
+    Returns:
+        Dictionnaire nom d'utilisateur -> ID (None si le streamer est introuvable)
+    """
+    if cache is None:
+        cache = BroadcasterIdCache()
+
+    resolved: dict[str, Optional[str]] = {}
+    # Logins à demander à l'API, normalisés, associés aux noms d'origine
+    pending: dict[str, list[str]] = {}
+    for username in usernames:
+        login_name = "".join(c for c in username if c.isascii()).lower()
+        if not login_name:
+            print(f"Nom d'utilisateur non valide après filtrage: {username}")
+            resolved[username] = None
+            continue
+        found, broadcaster_id = cache.lookup(login_name)
+        if found:
+            resolved[username] = broadcaster_id
+        else:
+            pending.setdefault(login_name, []).append(username)
+
+    logins = list(pending)
+    if logins:
+        print(
+            f"Résolution de {len(logins)} IDs de streamers ({len(resolved)} déjà en cache)"
+        )
+    for start in range(0, len(logins), USERS_BATCH_SIZE):
+        batch = logins[start : start + USERS_BATCH_SIZE]
+        try:
+            if rate_limiter:
+                await rate_limiter.acquire()
+            found_ids = {}
+            async for user in twitch.get_users(logins=batch):
+                found_ids[user.login.lower()] = user.id
+        except Exception as e:
+            # Lot non mis en cache : il sera retenté à la prochaine exécution
+            print(f"Erreur lors de la résolution d'un lot de {len(batch)} streamers: {e}")
+            for login_name in batch:
+                for username in pending[login_name]:
+                    resolved[username] = None
+            continue
+
+        for login_name in batch:
+            broadcaster_id = found_ids.get(login_name)
+            if broadcaster_id is None:
+                print(f"Streamer '{login_name}' introuvable (renommé ou banni ?)")
+            cache.store(login_name, broadcaster_id)
+            for username in pending[login_name]:
+                resolved[username] = broadcaster_id
+
+    cache.save()
+    return resolved
+
+
+def download_clip(
+    url_clip: str, destination_file: str, expected_duration: Optional[float] = None
+) -> bool:
     """
     Télécharge un clip Twitch à partir de son URL en utilisant yt-dlp et le sauvegarde dans un fichier spécifique.
 
+    Passe par le moteur de téléchargement partagé (API Python de yt-dlp et session
+    HTTP réutilisée) s'il est disponible, sinon lance la commande yt-dlp. Le
+    fichier obtenu est ensuite vérifié (flux lisibles, fin du fichier décodable).
+
     Args:
         url_clip (str): L'URL du clip Twitch à télécharger.
         destination_file (str): Le chemin complet du fichier où sauvegarder le clip (incluant l'extension).
+        expected_duration (float, optional): Durée annoncée par Twitch, comparée à celle du fichier.
 
     Returns:
         bool: True si le téléchargement a réussi, False sinon.
@@ -350,6 +604,16 @@ def download_clip(url_clip: str, destination_file: str) -> bool:
     if parent_dir and not os.path.exists(parent_dir):
         os.makedirs(parent_dir, exist_ok=True)
 
+    engine = get_download_engine()
+    if engine.available:
+        print(f"Téléchargement de {url_clip} vers {destination_file}")
+        try:
+            engine.download(url_clip, destination_file)
+        except Exception as e:
+            print(f"Erreur lors du téléchargement: {e}")
+            return False
+        return _verify_download(destination_file, expected_duration)
+
     try:
         # Commande yt-dlp avec options optimisées
         commande = [
@@ -369,8 +633,7 @@ def download_clip(url_clip: str, destination_file: str) -> bool:
 
         # Vérifier si le fichier a bien été créé
         if os.path.exists(destination_file):
-            print(f"Clip téléchargé avec succès: {destination_file}")
-            return True
+            return _verify_download(destination_file, expected_duration)
         else:
             # Chercher si le fichier a été sauvegardé avec une extension différente
             base_path = os.path.splitext(destination_file)[0]
@@ -379,11 +642,14 @@ def download_clip(url_clip: str, destination_file: str) -> bool:
                 for f in os.listdir(parent_dir or ".")
                 if os.path.isfile(os.path.join(parent_dir or ".", f))
                 and f.startswith(os.path.basename(base_path))
+                and not f.endswith(".part")
             ]
 
             if potential_files:
                 print(f"Clip téléchargé avec un nom différent: {potential_files[0]}")
-                return True
+                return _verify_download(
+                    os.path.join(parent_dir or ".", potential_files[0]), expected_duration
+                )
             else:
                 print(
                     "Téléchargement semble terminé mais le fichier n'a pas été trouvé."
@@ -406,24 +672,37 @@ def download_clip(url_clip: str, destination_file: str) -> bool:
         return False
 
 
+def _verify_download(path: str, expected_duration: Optional[float]) -> bool:
+    """Vérifie un clip téléchargé et supprime le fichier s'il est incomplet ou illisible."""
+    try:
+        verify_clip_file(path, expected_duration)
+    except ValueError as e:
+        print(f"Clip téléchargé invalide ({path}): {e}")
+        os.remove(path)
+        return False
+    print(f"Clip téléchargé avec succès: {path}")
+    return True
+
+
 async def prepare_clip_infos(
-    clips: list[Clip], download_dir: str
+    clips: list[Clip], download_dir: Optional[str] = None
 ) -> list[tuple[str, str]]:
     """
     Prépare une liste de tuples (chemin_du_clip, broadcaster_name) pour l'assemblage vidéo.
-    Télécharge les clips si besoin.
+    Les clips sont lus depuis le cache persistant ; seuls les absents sont téléchargés, en parallèle.
+
+    Args:
+        clips: Liste des clips à préparer
+        download_dir: Dossier du cache de clips (celui par défaut si absent)
     """
+    cache = ClipCache(download_dir) if download_dir else ClipCache()
+    cached_paths = await cache.ensure(clips)
+
     clip_infos = []
     for clip in clips:
-        # Génère un nom de fichier unique pour chaque clip
-        safe_title = "".join(c if c.isalnum() else "_" for c in clip.title)[:40]
-        filename = f"{clip.broadcaster_name}_{safe_title}_{clip.id}.mp4"
-        filepath = os.path.join(download_dir, filename)
-        # Télécharge le clip si le fichier n'existe pas déjà
-        if not os.path.exists(filepath):
-            success = download_clip(clip.url, filepath)
-            if not success:
-                print(f"Échec du téléchargement pour {clip.url}")
-                continue
+        filepath = cached_paths.get(clip.id)
+        if filepath is None:
+            print(f"Échec du téléchargement pour {clip.url}")
+            continue
         clip_infos.append((filepath, clip.broadcaster_name))
     return clip_infos
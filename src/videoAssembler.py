@@ -1,131 +1,792 @@
-from moviepy import VideoFileClip, TextClip, CompositeVideoClip, concatenate_videoclips
+from moviepy import VideoFileClip, TextClip, ImageClip, CompositeVideoClip, AudioClip
+from moviepy.config import FFMPEG_BINARY
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime
+from typing import Optional, Sequence
+from PIL import Image
+import hashlib
+import json
+import numpy as np
 import os
+import shutil
+import subprocess
+import tempfile
+import time
+from src.media_probe import MediaInfo, get_probe_cache
+from src.asset_cache import AssetCache
 
 INTRO_PATH = "assets/videos/INTRO.mp4"
 OUTRO_PATH = "assets/videos/OUTRO.mp4"
 TRANSI_PATH = "assets/videos/TRANSI.mp4"
+# Vidéos fixes, normalisées une seule fois dans le cache des vidéos fixes
+ASSET_PATHS = (INTRO_PATH, OUTRO_PATH, TRANSI_PATH)
+FONT_PATH = "assets/font/Montserrat-VariableFont_wght.ttf"
+# Images des tags @streamer déjà rastérisées
+TAG_CACHE_DIR = "data/tag_cache"
+# Style du tag @streamer pour une sortie 1080p, affiché en bas à droite
+TAG_STYLE = {
+    "font_size": 36,
+    "color": "white",
+    "bg_color": "#00000080",
+    "stroke_color": "black",
+    "stroke_width": 2,
+    "size": (600, 60),
+}
+# Incrustation du tag @streamer sur les clips. Sans tag, un clip déjà au format
+# de sortie est copié tel quel au lieu d'être réencodé.
+SHOW_STREAMER_TAGS = os.getenv("SHOW_STREAMER_TAGS", "1") != "0"
+# Nombre de segments rendus en parallèle, un processus chacun (0: un par cœur)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or os.cpu_count() or 1
+# Réglages d'encodage imposés par l'opérateur (vides : ceux du profil)
+RENDER_CRF = os.getenv("RENDER_CRF", "")
+RENDER_PRESET = os.getenv("RENDER_PRESET", "")
+RENDER_THREADS = int(os.getenv("RENDER_THREADS", "0"))
+# Hauteurs (16:9) et fréquences d'images de sortie possibles, de la moins chère à la plus chère
+OUTPUT_HEIGHTS = (720, 1080)
+OUTPUT_FPS = (30, 60)
+# Part de la durée des sources (0 à 1) qui doit être rendue sans perte de définition ni d'images
+PROFILE_COVERAGE = float(os.getenv("PROFILE_COVERAGE", "1.0"))
+# Temps d'encodage et taille de sortie de chaque rendu, par profil
+RENDER_STATS_PATH = "data/render_stats.jsonl"
+# Nom du codec tel que rapporté par ffprobe/ffmpeg pour chaque encodeur
+_ENCODER_CODECS = {"libx264": "h264", "libx265": "hevc", "aac": "aac"}
 
 
-def concatClips(clip_infos: list[tuple[str, str]], output_path: str) -> str:
+@dataclass(frozen=True)
+class OutputProfile:
+    """Format commun à tous les segments du best-of, pour pouvoir les concaténer sans réencodage."""
+
+    width: int = 1920
+    height: int = 1080
+    fps: int = 60
+    video_codec: str = "libx264"
+    preset: str = "veryfast"
+    threads: int = 4
+    crf: int = 23
+    audio_codec: str = "aac"
+    audio_rate: int = 48000
+    audio_channels: int = 2
+    # Recadrage centré au rapport largeur/hauteur donné avant mise à l'échelle (0: aucun)
+    crop_aspect: float = 0.0
+    # Débit vidéo cible ("1500k") à la place du CRF (vide: CRF)
+    video_bitrate: str = ""
+    # Profil et niveau H.264 imposés à l'encodeur : la concaténation reprend ceux du premier segment
+    h264_profile: str = "high"
+    h264_level: str = "4.2"
+    # Échelle de temps de la piste vidéo, commune à tous les segments (1/90000 s)
+    video_timescale: int = 90000
+
+
+DEFAULT_PROFILE = OutputProfile()
+
+
+@dataclass(frozen=True)
+class OutputTarget:
     """
-    Concatène une liste de clips vidéo en une seule vidéo avec MoviePy.
-    Chaque élément de clip_infos est un tuple (clip_path, broadcaster_name).
+    Sortie d'un rendu : les segments sont encodés pour toutes les sorties à partir
+    d'un seul décodage de chaque source. Les valeurs nulles reprennent celles du profil.
     """
-    if not clip_infos:
-        print("Aucun clip à concaténer.")
+
+    name: str
+    width: int = 0
+    height: int = 0
+    crop_aspect: float = 0.0
+    video_bitrate: str = ""
+
+
+# Best-of 16:9, au profil choisi d'après les sources
+MAIN_TARGET = OutputTarget("main")
+# Format vertical 9:16 (Shorts), recadré au centre de l'image
+SHORTS_TARGET = OutputTarget("shorts", width=1080, height=1920, crop_aspect=9 / 16)
+# Aperçu 720p léger
+PREVIEW_TARGET = OutputTarget("preview", width=1280, height=720, video_bitrate="1500k")
+# Sorties supplémentaires rendues avec le best-of, par nom ("shorts,preview")
+EXTRA_OUTPUTS = [
+    name.strip() for name in os.getenv("EXTRA_OUTPUTS", "").split(",") if name.strip()
+]
+OUTPUT_TARGETS = (MAIN_TARGET,) + tuple(
+    target for target in (SHORTS_TARGET, PREVIEW_TARGET) if target.name in EXTRA_OUTPUTS
+)
+
+
+def target_profile(profile: OutputProfile, target: OutputTarget) -> OutputProfile:
+    """Profil d'encodage d'une sortie : celui du best-of, avec la définition, le recadrage et le débit de la sortie."""
+    return replace(
+        profile,
+        width=target.width or profile.width,
+        height=target.height or profile.height,
+        crop_aspect=target.crop_aspect,
+        video_bitrate=target.video_bitrate,
+    )
+
+
+def target_output_path(output_path: str, target: OutputTarget) -> str:
+    """Fichier d'une sortie : celui du best-of pour la sortie principale, suffixé du nom de la sortie sinon."""
+    if target == MAIN_TARGET:
+        return output_path
+    root, ext = os.path.splitext(output_path)
+    return f"{root}_{target.name}{ext}"
+
+
+def worker_profile(profile: OutputProfile, workers: int) -> OutputProfile:
+    """
+    Répartit les cœurs entre les encodeurs des segments rendus en parallèle,
+    sauf si l'opérateur a fixé le nombre de threads (RENDER_THREADS).
+    """
+    if RENDER_THREADS:
+        return replace(profile, threads=RENDER_THREADS)
+    return replace(profile, threads=max(1, (os.cpu_count() or 1) // max(1, workers)))
+
+
+def _covered_value(values: list[tuple[float, float]], coverage: float) -> float:
+    """Plus petite valeur atteinte par au moins `coverage` de la durée totale ((valeur, durée) par source)."""
+    values = sorted(values)
+    total = sum(duration for _, duration in values)
+    covered = 0.0
+    for value, duration in values:
+        covered += duration
+        if covered >= total * coverage - 1e-6:
+            return value
+    return values[-1][0]
+
+
+def select_output_profile(
+    infos: list[Optional[MediaInfo]],
+    base: OutputProfile = DEFAULT_PROFILE,
+    coverage: float = PROFILE_COVERAGE,
+) -> OutputProfile:
+    """
+    Choisit le profil de sortie le moins coûteux qui ne dégrade pas les sources.
+
+    La hauteur et la fréquence d'images retenues sont les plus petites de
+    OUTPUT_HEIGHTS et OUTPUT_FPS qui couvrent les sources représentant `coverage`
+    de la durée totale : des clips 720p30 ne sont ni agrandis ni doublés en images.
+    Si une source n'a pas pu être analysée, le profil de base est gardé.
+    Les réglages RENDER_CRF, RENDER_PRESET et RENDER_THREADS s'appliquent ensuite.
+
+    Args:
+        infos: Caractéristiques des clips sources (None si inconnues)
+        base: Profil de départ (codecs, audio, réglages par défaut)
+        coverage: Part de la durée des sources à rendre sans perte (1: toutes)
+
+    Returns:
+        Le profil de sortie
+    """
+    profile = base
+    if infos and all(info is not None for info in infos):
+        heights = [(info.height, info.duration or 1.0) for info in infos]
+        rates = [(info.fps, info.duration or 1.0) for info in infos]
+        source_height = _covered_value(heights, coverage)
+        source_fps = _covered_value(rates, coverage)
+        height = next((h for h in OUTPUT_HEIGHTS if h >= source_height), OUTPUT_HEIGHTS[-1])
+        # Tolérance pour les fréquences NTSC (29,97 images/s)
+        fps = next((f for f in OUTPUT_FPS if f >= source_fps - 0.1), OUTPUT_FPS[-1])
+        profile = replace(profile, width=height * 16 // 9, height=height, fps=fps)
+
+    if RENDER_CRF:
+        profile = replace(profile, crf=int(RENDER_CRF))
+    if RENDER_PRESET:
+        profile = replace(profile, preset=RENDER_PRESET)
+    if RENDER_THREADS:
+        profile = replace(profile, threads=RENDER_THREADS)
+    return profile
+
+
+def record_render_stats(
+    profile: OutputProfile, output_path: str, encode_seconds: float, clips_count: int
+):
+    """Ajoute le temps d'encodage et la taille de sortie d'un rendu au journal RENDER_STATS_PATH."""
+    try:
+        stats = {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "profile": asdict(profile),
+            "output": output_path,
+            "clips": clips_count,
+            "encode_seconds": round(encode_seconds, 2),
+            "output_bytes": os.path.getsize(output_path),
+        }
+        os.makedirs(os.path.dirname(RENDER_STATS_PATH), exist_ok=True)
+        with open(RENDER_STATS_PATH, "a") as f:
+            f.write(json.dumps(stats) + "\n")
+    except Exception as e:
+        print(f"Erreur lors de l'enregistrement des statistiques de rendu: {e}")
+
+
+def streamer_tag(broadcaster_name: Optional[str]) -> Optional[str]:
+    """Texte incrusté sur un clip ("@streamer"), ou None si les tags sont désactivés."""
+    if not SHOW_STREAMER_TAGS:
+        return None
+    return f"@{broadcaster_name or 'StreamerInconnu'}"
+
+
+def matches_profile(info: MediaInfo, profile: OutputProfile = DEFAULT_PROFILE) -> bool:
+    """
+    Indique si une vidéo peut être concaténée telle quelle avec des segments encodés selon le profil.
+
+    Le profil et le niveau H.264 doivent être ceux imposés à l'encodeur, et les
+    horodatages vidéo doivent tomber juste sur l'échelle de temps commune (copie
+    remultiplexée par copy_segment). Sinon, ou si l'analyse ne les donne pas, la vidéo est réencodée.
+    """
+    return (
+        profile.video_codec == "libx264"
+        and info.video_codec == "h264"
+        and info.video_profile.lower() == profile.h264_profile
+        and info.video_level == round(float(profile.h264_level) * 10)
+        and info.video_timescale > 0
+        and info.video_timescale % profile.fps == 0
+        and profile.video_timescale % profile.fps == 0
+        and info.pixel_format == "yuv420p"
+        and (info.width, info.height) == (profile.width, profile.height)
+        and abs(info.fps - profile.fps) < 0.01
+        and info.has_audio
+        and info.audio_codec == _ENCODER_CODECS.get(profile.audio_codec, profile.audio_codec)
+        and info.audio_sample_rate == profile.audio_rate
+        and info.audio_channels == profile.audio_channels
+        and not profile.crop_aspect
+    )
+
+
+def copy_segment(source_path: str, output_path: str, profile: OutputProfile = DEFAULT_PROFILE) -> str:
+    """
+    Copie le premier flux vidéo et le premier flux audio d'une vidéo dans un segment, sans réencodage.
+    La piste vidéo est remultiplexée à l'échelle de temps du profil, comme les segments encodés.
+
+    Returns:
+        Le chemin du segment, ou une chaîne vide en cas d'erreur
+    """
+    result = subprocess.run(
+        [
+            FFMPEG_BINARY,
+            "-v", "error",
+            "-y",
+            "-i", source_path,
+            "-map", "0:v:0",
+            "-map", "0:a:0",
+            "-c", "copy",
+            "-video_track_timescale", str(profile.video_timescale),
+            "-movflags", "+faststart",
+            output_path,
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        print(f"Erreur lors de la copie du segment {source_path}: {result.stderr.strip()}")
         return ""
+    return output_path
+
+
+def plan_segments(clip_infos: list[tuple[str, str]]) -> list[tuple[str, Optional[str]]]:
+    """
+    Construit la liste ordonnée des segments du best-of : intro, clips, outro,
+    avec la transition insérée entre deux segments consécutifs.
 
-    # Préparer la liste finale des chemins de clips (intro, clips, outro)
-    all_infos = []
+    Args:
+        clip_infos: Tuples (clip_path, broadcaster_name)
+
+    Returns:
+        Tuples (chemin_source, tag) où tag est "@streamer" pour un clip (si les tags
+        sont activés), None pour les vidéos fixes
+    """
+    items = []
     if os.path.exists(INTRO_PATH):
-        all_infos.append((INTRO_PATH, None))
-    all_infos.extend(clip_infos)
+        items.append((INTRO_PATH, None))
+    for path, name in clip_infos:
+        if not os.path.exists(path):
+            print(f"Avertissement: Le clip {path} n'existe pas et sera ignoré.")
+            continue
+        if not name:
+            print(
+                f"Avertissement: broadcaster_name manquant pour {path}, valeur par défaut utilisée."
+            )
+            name = "StreamerInconnu"
+        print(f"Ajout du clip: {path} pour le streamer: {name}")
+        items.append((path, streamer_tag(name)))
     if os.path.exists(OUTRO_PATH):
-        all_infos.append((OUTRO_PATH, None))
+        items.append((OUTRO_PATH, None))
 
-    TRANSI_VIDEO = ""
-    if os.path.exists(TRANSI_PATH):
-        # Ajouter la transition si elle existe
-        TRANSI_VIDEO = (
-            VideoFileClip(TRANSI_PATH).resized(width=1920, height=1080).with_fps(60)
-        )
+    return interleave_transitions(items)
 
-    # Filtrer les chemins existants et avertir pour les manquants
-    valid_infos = []
-    for path, name in all_infos:
-        if os.path.exists(path):
-            # Pour intro/outro, pas de nom de streamer
-            if path in (INTRO_PATH, OUTRO_PATH):
-                valid_infos.append((path, None))
-            else:
-                if not name:
-                    print(
-                        f"Avertissement: broadcaster_name manquant pour {path}, valeur par défaut utilisée."
-                    )
-                    name = "StreamerInconnu"
-                print(f"Ajout du clip: {path} pour le streamer: {name}")
-                valid_infos.append((path, name))
-        else:
-            print(f"Avertissement: Le clip {path} n'existe pas et sera ignoré.")
-    if not valid_infos:
-        print("Aucun clip valide à concaténer.")
-        return ""
 
-    # Créer le dossier de sortie s'il n'existe pas
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+def interleave_transitions(items: list[tuple]) -> list[tuple]:
+    """Insère la transition (TRANSI_PATH, None) entre deux éléments consécutifs, si elle existe."""
+    segments = []
+    for i, item in enumerate(items):
+        if i > 0 and os.path.exists(TRANSI_PATH):
+            segments.append((TRANSI_PATH, None))
+        segments.append(item)
+    return segments
 
-    # Charger les clips vidéo
-    video_clips = []
-    for path, _ in valid_infos:
-        try:
-            clip = VideoFileClip(path)
-            clip = clip.resized(width=1920, height=1080)
-            clip = clip.with_fps(60)
-            video_clips.append(clip)
-        except Exception as e:
-            print(f"Erreur lors de l'ouverture du clip {path}: {e}")
 
-    if not video_clips:
-        print("Aucun clip valide à concaténer.")
-        return ""
+def select_segment_paths(segments: list[tuple], rendered_paths: list[str]) -> list[str]:
+    """
+    Retourne les segments rendus à concaténer, dans l'ordre.
+    Un segment en échec est retiré avec la transition qui le précédait.
 
-    # Ajouter le texte @streamer sur chaque clip (sauf intro/outro)
-    processed_clips = []
-    for idx, clip in enumerate(video_clips):
-        path, broadcaster_name = valid_infos[idx]
-        if path == INTRO_PATH or path == OUTRO_PATH:
-            # Ne rien ajouter pour l'intro ou l'outro
-            processed_clips.append(clip)
+    Args:
+        segments: Plan (source, tag) issu de `plan_segments` ou `interleave_transitions`
+        rendered_paths: Chemin rendu pour chaque élément du plan ("" en cas d'échec)
+    """
+    selected = []
+    previous_is_transition = False
+    for (source, _), path in zip(segments, rendered_paths):
+        if source == TRANSI_PATH and not selected:
+            # Pas de transition en ouverture si le premier segment a échoué
             continue
+        if path:
+            selected.append(path)
+            previous_is_transition = source == TRANSI_PATH
+        elif selected and previous_is_transition:
+            # Segment illisible : la transition qui le précédait est retirée aussi
+            selected.pop()
+            previous_is_transition = False
+    return selected
 
-        if not broadcaster_name:
-            broadcaster_name = "LeStreamerLuiLà"
-        streamer_tag = f"@{broadcaster_name}"
-
-        # Créer le clip de texte
-        txt_clip = (
-            TextClip(
-                text=streamer_tag,
-                font_size=36,
-                color="white",
-                font="assets/font/Montserrat-VariableFont_wght.ttf",
-                bg_color="#00000080",
-                stroke_color="black",
-                stroke_width=2,
-                size=(600, 60),
-                method="caption",
-            )
-            .with_duration(clip.duration)
-            .with_position(("right", "bottom"))
+
+def _stereo_audio(clip, profile: OutputProfile):
+    """Retourne une piste audio au format du profil : silence si absente, canal dupliqué si mono."""
+    audio = clip.audio
+    if audio is None:
+        return AudioClip(
+            lambda t: np.zeros((np.size(t), profile.audio_channels)).squeeze(),
+            duration=clip.duration,
+            fps=profile.audio_rate,
+        )
+    if audio.nchannels == 1 and profile.audio_channels == 2:
+        return AudioClip(
+            lambda t: np.repeat(np.reshape(audio.get_frame(t), (-1, 1)), 2, axis=1).squeeze(),
+            duration=clip.duration,
+            fps=profile.audio_rate,
         )
+    return audio
 
-        # Superposer le texte sur le clip vidéo
-        composite = CompositeVideoClip([clip, txt_clip])
-        processed_clips.append(composite)
 
+def _probe_or_none(path: str) -> Optional[MediaInfo]:
+    """Analyse d'un fichier via le cache d'analyse, None s'il est absent ou illisible."""
     try:
-        final_clip = concatenate_videoclips(
-            processed_clips,
-            method="chain",
-            transition=TRANSI_VIDEO if TRANSI_VIDEO else None,
+        return get_probe_cache().probe(path)
+    except ValueError:
+        return None
+
+
+def render_tag_image(tag: str, profile: OutputProfile = DEFAULT_PROFILE) -> str:
+    """
+    Rastérise le tag "@streamer" une seule fois en image RGBA, mise en cache par texte et style.
+    Le style est défini pour une sortie 1080p (16:9) et mis à l'échelle de la sortie.
+
+    Returns:
+        Le chemin de l'image PNG
+    """
+    scale = min(profile.width / 1920, profile.height / 1080)
+    style = {
+        "font_size": round(TAG_STYLE["font_size"] * scale),
+        "color": TAG_STYLE["color"],
+        "bg_color": TAG_STYLE["bg_color"],
+        "stroke_color": TAG_STYLE["stroke_color"],
+        "stroke_width": max(1, round(TAG_STYLE["stroke_width"] * scale)),
+        "size": tuple(round(side * scale) for side in TAG_STYLE["size"]),
+    }
+    key = hashlib.sha256(
+        json.dumps({"text": tag, "font": FONT_PATH, **style}, sort_keys=True).encode()
+    ).hexdigest()[:16]
+    image_path = os.path.join(TAG_CACHE_DIR, f"{key}.png")
+    if os.path.exists(image_path):
+        return image_path
+
+    os.makedirs(TAG_CACHE_DIR, exist_ok=True)
+    txt_clip = TextClip(text=tag, font=FONT_PATH, method="caption", **style)
+    try:
+        rgb = txt_clip.get_frame(0)
+        alpha = np.round(txt_clip.mask.get_frame(0) * 255).astype(np.uint8)
+    finally:
+        txt_clip.close()
+    tmp_path = f"{image_path}.{os.getpid()}.tmp.png"
+    Image.fromarray(np.dstack([rgb.astype(np.uint8), alpha]), "RGBA").save(tmp_path)
+    os.replace(tmp_path, image_path)
+    return image_path
+
+
+def _frame_filters(profile: OutputProfile) -> str:
+    """Filtres vidéo ffmpeg qui mettent une image source au format du profil."""
+    filters = []
+    if profile.crop_aspect:
+        aspect = profile.crop_aspect
+        filters.append(f"crop='min(iw,ih*{aspect})':'min(ih,iw/{aspect})'")
+    filters += [f"scale={profile.width}:{profile.height}", "setsar=1", f"fps={profile.fps}"]
+    return ",".join(filters)
+
+
+def _stream_format_args(profile: OutputProfile) -> list[str]:
+    """Options fixant le profil et le niveau H.264 et l'échelle de temps vidéo, identiques pour tous les segments."""
+    args = ["-video_track_timescale", str(profile.video_timescale)]
+    if profile.video_codec == "libx264":
+        args = ["-profile:v", profile.h264_profile, "-level:v", profile.h264_level] + args
+    return args
+
+
+def _video_encoder_args(profile: OutputProfile) -> list[str]:
+    """Options de l'encodeur vidéo : débit cible s'il est fixé, qualité constante (CRF) sinon."""
+    args = [
+        "-c:v", profile.video_codec,
+        "-preset", profile.preset,
+        "-threads", str(profile.threads),
+    ] + _stream_format_args(profile)
+    if profile.video_bitrate:
+        return args + ["-b:v", profile.video_bitrate]
+    return args + ["-crf", str(profile.crf)]
+
+
+def _render_segment_ffmpeg(
+    source_path: str,
+    output_paths: list[str],
+    tag_images: list[Optional[str]],
+    profiles: list[OutputProfile],
+    info: Optional[MediaInfo],
+) -> bool:
+    """
+    Normalise une vidéo en un seul passage ffmpeg : la source est décodée une
+    fois puis répartie (filtre split) entre les sorties, chacune avec son
+    recadrage, sa mise à l'échelle, son fps, son tag (filtre overlay) et son encodeur.
+    """
+    command = [FFMPEG_BINARY, "-v", "error", "-y", "-i", source_path]
+    # Une entrée image par sortie : une étiquette du graphe de filtres ne se lit qu'une fois
+    image_inputs = {}
+    for i, tag_image in enumerate(tag_images):
+        if tag_image:
+            image_inputs[i] = len(image_inputs) + 1
+            command += ["-i", tag_image]
+
+    if info is not None and info.has_audio:
+        audio_map = "0:a:0"
+    else:
+        # Piste silencieuse : tous les segments doivent avoir le même format audio
+        command += [
+            "-f", "lavfi",
+            "-i", f"anullsrc=r={profiles[0].audio_rate}:cl=stereo",
+        ]
+        audio_map = f"{len(image_inputs) + 1}:a"
+
+    chains = []
+    if len(profiles) > 1:
+        chains.append(
+            f"[0:v]split={len(profiles)}" + "".join(f"[src{i}]" for i in range(len(profiles)))
         )
-        final_clip.write_videofile(
+        sources = [f"[src{i}]" for i in range(len(profiles))]
+    else:
+        sources = ["[0:v]"]
+    for i, profile in enumerate(profiles):
+        chain = sources[i] + _frame_filters(profile)
+        if i in image_inputs:
+            chain += f"[base{i}];[base{i}][{image_inputs[i]}:v]overlay=W-w:H-h"
+        chains.append(chain + f",format=yuv420p[v{i}]")
+    command += ["-filter_complex", ";".join(chains)]
+
+    for i, (profile, output_path) in enumerate(zip(profiles, output_paths)):
+        command += [
+            "-map", f"[v{i}]",
+            "-map", audio_map,
+            "-shortest",
+            *_video_encoder_args(profile),
+            "-c:a", profile.audio_codec,
+            "-ar", str(profile.audio_rate),
+            "-ac", str(profile.audio_channels),
+            # moov en tête : le segment peut être lu en flux par la concaténation
+            "-movflags", "+faststart",
+            output_path,
+        ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"Erreur ffmpeg lors du rendu du segment {source_path}: {result.stderr.strip()[-500:]}")
+        return False
+    return True
+
+
+def _render_segment_moviepy(
+    source_path: str,
+    output_path: str,
+    tag_image: Optional[str],
+    profile: OutputProfile,
+) -> str:
+    """
+    Rendu de secours avec MoviePy, si le passage ffmpeg a échoué. La source
+    n'est ouverte que le temps de ce segment : tous ses lecteurs sont fermés à la fin.
+    """
+    clip = None
+    opened = []
+    try:
+        clip = VideoFileClip(source_path)
+        video = clip
+        if profile.crop_aspect:
+            width = min(clip.w, round(clip.h * profile.crop_aspect))
+            height = min(clip.h, round(clip.w / profile.crop_aspect))
+            video = video.cropped(
+                x_center=clip.w / 2, y_center=clip.h / 2, width=width, height=height
+            )
+        video = video.resized(width=profile.width, height=profile.height).with_fps(profile.fps)
+        video = video.with_audio(_stereo_audio(clip, profile))
+
+        if tag_image:
+            # Superposer le tag pré-rendu sur le clip vidéo
+            tag_clip = (
+                ImageClip(tag_image, transparent=True)
+                .with_duration(video.duration)
+                .with_position(("right", "bottom"))
+            )
+            opened.append(tag_clip)
+            video = CompositeVideoClip([video, tag_clip])
+            opened.append(video)
+
+        video.write_videofile(
             output_path,
-            codec="libx264",
-            audio_codec="aac",
-            temp_audiofile="temp-audio.m4a",
+            codec=profile.video_codec,
+            audio_codec=profile.audio_codec,
+            audio_fps=profile.audio_rate,
+            temp_audiofile=f"{output_path}.audio.m4a",
             remove_temp=True,
-            threads=4,
-            preset="veryfast",
-            fps=60,
+            threads=profile.threads,
+            preset=profile.preset,
+            fps=profile.fps,
+            bitrate=profile.video_bitrate or None,
+            ffmpeg_params=(
+                [] if profile.video_bitrate else ["-crf", str(profile.crf)]
+            ) + _stream_format_args(profile) + ["-movflags", "+faststart"],
+            logger=None,
         )
-        print(f"Vidéo concaténée avec succès: {output_path}")
-        size_mb = os.path.getsize(output_path) / (1024 * 1024)
-        print(f"Taille du fichier: {size_mb:.2f} Mo")
         return output_path
     except Exception as e:
-        print(f"Erreur lors de la concaténation avec MoviePy: {e}")
+        print(f"Erreur lors du rendu du segment {source_path}: {e}")
         return ""
     finally:
-        for clip in video_clips:
+        for opened_clip in opened:
+            opened_clip.close()
+        if clip is not None:
             clip.close()
+
+
+def render_segment_targets(
+    source_path: str,
+    output_paths: list[str],
+    tag: Optional[str] = None,
+    profiles: Sequence[OutputProfile] = (DEFAULT_PROFILE,),
+    info: Optional[MediaInfo] = None,
+) -> list[str]:
+    """
+    Normalise une vidéo au format de chaque sortie (recadrage, résolution, fps,
+    audio) et y incruste le tag du streamer, en ne la décodant qu'une fois.
+
+    Une vidéo sans tag déjà au format d'une sortie est copiée sans réencodage.
+    Sinon, le tag est rastérisé une fois par sortie (voir `render_tag_image`) puis
+    incrusté par le filtre overlay de ffmpeg pendant l'encodage.
+
+    Args:
+        source_path: Vidéo source
+        output_paths: Fichier MP4 du segment pour chaque sortie
+        tag: Texte "@streamer" affiché en bas à droite (aucun si None)
+        profiles: Format de chaque sortie
+        info: Caractéristiques déjà connues de la source (lues ici si absentes)
+
+    Returns:
+        Le chemin du segment de chaque sortie, ou une chaîne vide en cas d'erreur
+    """
+    if info is None:
+        try:
+            info = get_probe_cache().probe(source_path)
+        except ValueError as e:
+            print(f"Analyse impossible de {source_path}: {e}")
+
+    results = [""] * len(profiles)
+    pending = []
+    for i, (profile, output_path) in enumerate(zip(profiles, output_paths)):
+        if not tag and info is not None and matches_profile(info, profile):
+            results[i] = copy_segment(source_path, output_path, profile)
+        if not results[i]:
+            pending.append(i)
+    if not pending:
+        return results
+
+    tag_images = {}
+    if tag:
+        try:
+            tag_images = {i: render_tag_image(tag, profiles[i]) for i in pending}
+        except Exception as e:
+            print(f"Erreur lors du rendu du tag {tag}, segment sans tag: {e}")
+
+    if _render_segment_ffmpeg(
+        source_path,
+        [output_paths[i] for i in pending],
+        [tag_images.get(i) for i in pending],
+        [profiles[i] for i in pending],
+        info,
+    ):
+        for i in pending:
+            results[i] = output_paths[i]
+        return results
+    for i in pending:
+        results[i] = _render_segment_moviepy(
+            source_path, output_paths[i], tag_images.get(i), profiles[i]
+        )
+    return results
+
+
+def render_segment(
+    source_path: str,
+    output_path: str,
+    tag: Optional[str] = None,
+    profile: OutputProfile = DEFAULT_PROFILE,
+    info: Optional[MediaInfo] = None,
+) -> str:
+    """
+    Normalise une vidéo pour une seule sortie (voir `render_segment_targets`).
+
+    Returns:
+        Le chemin du segment, ou une chaîne vide en cas d'erreur
+    """
+    return render_segment_targets(source_path, [output_path], tag, [profile], info)[0]
+
+
+def render_asset(source_path: str, profile: OutputProfile = DEFAULT_PROFILE) -> str:
+    """
+    Retourne la version normalisée d'une vidéo fixe depuis le cache des vidéos
+    fixes, en la rendant seulement si elle n'y est pas encore.
+
+    Returns:
+        Le chemin du segment, ou une chaîne vide en cas d'erreur
+    """
+    entry = AssetCache().get(source_path, profile, render_segment)
+    return entry["path"] if entry else ""
+
+
+def render_asset_targets(source_path: str, profiles: list[OutputProfile]) -> list[str]:
+    """Version normalisée d'une vidéo fixe pour chaque sortie (voir `render_asset`)."""
+    return [render_asset(source_path, profile) for profile in profiles]
+
+
+def concat_segments(segment_paths: list[str], output_path: str) -> str:
+    """
+    Concatène des segments au même format avec le démultiplexeur concat de ffmpeg, sans réencodage.
+
+    Returns:
+        Le chemin de la vidéo, ou une chaîne vide en cas d'erreur
+    """
+    list_fd, list_path = tempfile.mkstemp(suffix=".txt")
+    try:
+        with os.fdopen(list_fd, "w") as f:
+            for path in segment_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        result = subprocess.run(
+            [
+                FFMPEG_BINARY,
+                "-v", "error",
+                "-y",
+                "-f", "concat",
+                "-safe", "0",
+                "-i", list_path,
+                "-c", "copy",
+                "-movflags", "+faststart",
+                output_path,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            print(f"Erreur lors de la concaténation des segments: {result.stderr.strip()}")
+            return ""
+        return output_path
+    finally:
+        os.remove(list_path)
+
+
+def concatClips(
+    clip_infos: list[tuple[str, str]],
+    output_path: str,
+    targets: tuple[OutputTarget, ...] = OUTPUT_TARGETS,
+) -> str:
+    """
+    Concatène une liste de clips vidéo en une seule vidéo.
+    Chaque élément de clip_infos est un tuple (clip_path, broadcaster_name).
+
+    Chaque segment (intro, transition, clip avec son tag, outro) est normalisé
+    dans un fichier intermédiaire, ou simplement copié s'il n'a pas de tag et
+    qu'il est déjà au format de sortie, puis les segments sont assemblés sans réencodage.
+    Les segments sont rendus en parallèle par RENDER_WORKERS processus, chaque
+    source n'étant ouverte que pendant le rendu de son segment. Les
+    vidéos fixes (intro, transition, outro) viennent du cache des vidéos fixes.
+
+    Chaque source n'est décodée qu'une fois pour toutes les sorties `targets`
+    (la première est la vidéo principale, écrite dans output_path ; les autres
+    sont écrites à côté, voir `target_output_path`).
+
+    Returns:
+        Le chemin de la vidéo principale, ou une chaîne vide en cas d'erreur
+    """
+    if not clip_infos:
+        print("Aucun clip à concaténer.")
+        return ""
+
+    segments = plan_segments(clip_infos)
+    if not segments:
+        print("Aucun clip valide à concaténer.")
+        return ""
+
+    # Créer le dossier de sortie s'il n'existe pas
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    segments_dir = tempfile.mkdtemp(prefix="segments_", dir=output_dir or ".")
+    started = time.monotonic()
+
+    try:
+        # Un segment identique (la transition) n'est rendu qu'une fois
+        distinct_segments = list(dict.fromkeys(segments))
+        workers = min(RENDER_WORKERS, len(distinct_segments))
+        profile = worker_profile(
+            select_output_profile(
+                [_probe_or_none(path) for path, _ in clip_infos if os.path.exists(path)]
+            ),
+            workers,
+        )
+        print(f"Profil de sortie: {profile.width}x{profile.height} à {profile.fps} images/s")
+        profiles = [target_profile(profile, target) for target in targets]
+        with ProcessPoolExecutor(max_workers=workers) as render_pool:
+            futures = {}
+            for i, (source, tag) in enumerate(distinct_segments):
+                if source in ASSET_PATHS and tag is None:
+                    futures[(source, tag)] = render_pool.submit(
+                        render_asset_targets, source, profiles
+                    )
+                else:
+                    futures[(source, tag)] = render_pool.submit(
+                        render_segment_targets,
+                        source,
+                        [
+                            os.path.join(segments_dir, f"{i:03d}_{target.name}.mp4")
+                            for target in targets
+                        ],
+                        tag,
+                        profiles,
+                    )
+            rendered = {segment: future.result() for segment, future in futures.items()}
+        encode_seconds = time.monotonic() - started
+
+        outputs = []
+        for index, (target, target_prof) in enumerate(zip(targets, profiles)):
+            segment_paths = select_segment_paths(
+                segments, [rendered[segment][index] for segment in segments]
+            )
+            target_path = target_output_path(output_path, target)
+            if not segment_paths:
+                print(f"Aucun clip valide à concaténer pour la sortie {target.name}.")
+                outputs.append("")
+                continue
+            if not concat_segments(segment_paths, target_path):
+                outputs.append("")
+                continue
+            record_render_stats(target_prof, target_path, encode_seconds, len(clip_infos))
+            print(f"Vidéo concaténée avec succès: {target_path}")
+            size_mb = os.path.getsize(target_path) / (1024 * 1024)
+            print(f"Taille du fichier: {size_mb:.2f} Mo")
+            outputs.append(target_path)
+        return outputs[0]
+    finally:
+        shutil.rmtree(segments_dir, ignore_errors=True)